@@ -0,0 +1,134 @@
+import threading
+import time
+
+import numpy as np
+
+from device_io import SignalGenerator
+
+
+class FrameRingBuffer:
+    """Fixed-capacity ring of spectrum frames.
+
+    A single producer writes frames in place and publishes them by bumping
+    ``count``; readers never take a lock and retry if the producer lapped
+    the slot they were copying.
+    """
+
+    def __init__(self, capacity: int = 64, n_length: int = 4096):
+        self.capacity = capacity
+        self.n_length = n_length
+        self.frames = np.zeros((capacity, n_length))
+        self.timestamps = np.zeros(capacity)
+        self.count = 0
+
+    def next_slot(self):
+        return self.frames[self.count % self.capacity]
+
+    def commit(self, timestamp: float):
+        self.timestamps[self.count % self.capacity] = timestamp
+        self.count += 1
+
+    def push(self, y, timestamp: float):
+        self.next_slot()[:] = y
+        self.commit(timestamp)
+
+    def latest(self, out=None):
+        """Copy the newest frame, return (frame, timestamp, seq) or None."""
+        while True:
+            seq = self.count
+            if seq == 0:
+                return None
+            idx = (seq - 1) % self.capacity
+            if out is None:
+                frame = self.frames[idx].copy()
+            else:
+                frame = out
+                frame[:] = self.frames[idx]
+            timestamp = self.timestamps[idx]
+            if self.count - seq < self.capacity - 1:
+                return frame, timestamp, seq
+
+    def clear(self):
+        self.count = 0
+
+
+class AcquisitionWorker(threading.Thread):
+    """Owns the SignalGenerator and keeps the ring buffer filled.
+
+    All DLL calls happen on this thread so long integration times never
+    block the GUI, which only pulls the latest frame. An optional
+    ``recorder`` (recorder.SessionRecorder) is started here and gets every
+    frame, numbered by its ring buffer sequence.
+    """
+
+    def __init__(
+        self, int_time: int = 100, capacity: int = 64, backend=None, recorder=None
+    ):
+        super().__init__(daemon=True)
+        self.int_time = int_time
+        self.backend = backend
+        self.recorder = recorder
+        self.capacity = capacity
+        self.buffer = FrameRingBuffer(capacity=capacity)
+        self.finished = False
+        self.axis = None
+        self.x = None
+        self.error = None
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            signal_generator = SignalGenerator(
+                int_time=self.int_time, backend=self.backend
+            )
+            signal_generator.start()
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+
+        try:
+            if signal_generator.n_length != self.buffer.n_length:
+                self.buffer = FrameRingBuffer(
+                    capacity=self.capacity, n_length=signal_generator.n_length
+                )
+            self.axis = signal_generator.axis
+            self.x = signal_generator.generate_x()
+            if self.recorder is not None:
+                self.recorder.start(self.x)
+            self.read_frame(signal_generator)
+            self.ready.set()
+            while not self._stop_event.is_set():
+                self.read_frame(signal_generator)
+        except EOFError:
+            self.finished = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+            signal_generator.close_spectrometers()
+
+    def read_frame(self, signal_generator):
+        slot = self.buffer.next_slot()
+        signal_generator.read_y(out=slot)
+        timestamp = time.monotonic()
+        self.buffer.commit(timestamp)
+        recorder = self.recorder  # the GUI detaches it when recording fails
+        if recorder is not None:
+            recorder.record_frame(slot, timestamp, self.buffer.count, self.int_time)
+
+    def wait_ready(self, timeout: float = None):
+        """Block until the first frame is in, re-raise start errors."""
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.x
+
+    def latest(self, out=None):
+        return self.buffer.latest(out)
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
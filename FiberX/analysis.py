@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def polygon_centroid(x, y):
+    """Centroid of the closed polygon through the (x, y) vertices.
+
+    Shoelace formula, same result as shapely's Polygon(...).centroid for the
+    simple polygons we build; returns (nan, nan) for a zero-area polygon.
+    """
+    x0, x1 = x, np.roll(x, -1)
+    y0, y1 = y, np.roll(y, -1)
+    cross = x0 * y1 - x1 * y0
+    area6 = 3 * cross.sum()
+    if area6 == 0:
+        return np.nan, np.nan
+    return np.dot(x0 + x1, cross) / area6, np.dot(y0 + y1, cross) / area6
+
+
+def area_centroid(x, y, il, ir, base=100.0):
+    """Centroid of the area between y[il:ir] and the line y = base."""
+    px = np.concatenate((x[il:ir], (x[ir], x[il])))
+    py = np.concatenate((y[il:ir], (base, base)))
+    return polygon_centroid(px, py)
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
+from tkinter import messagebox
 
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 import matplotlib.pyplot as plt
@@ -8,15 +9,15 @@ import matplotlib.pyplot as plt
 import os
 import ctypes
 import random
-import pandas as pd
-import openpyxl
-import numpy as np
-from shapely.geometry import Polygon
-from scipy.ndimage import gaussian_filter1d
+import time
 
 from device_io import SignalGenerator, resource_path
+from core import AnalysisPipeline
+from export import ExportJob, ExportParameters, build_export
+from library import SpectrumLibrary
+from smoothing import IncrementalGaussian
+from timeseries import TimeSeriesStore
 from file_io import (
-    load_file,
     make_dark_file,
     make_bright_file,
     save_file,
@@ -55,12 +56,17 @@ class App(ttk.Frame):
         self.min_idx_display = None
         self.fix_minimum = False
         self.centroid_x, self.centroid_y = None, None
-        self.intensities = []
+        self.last_ts = None
+        self.series = TimeSeriesStore(["centroid", "intensity", "min", "area_ratio"])
         self.intensities_sm = []
-        self.mins = []
-        self.centroids = []
         self.centroids_sm = []
-        self.area_ratios = []
+        self.centroid_smoother = IncrementalGaussian(
+            sigma=10, source=self.series.columns["centroid"]
+        )
+        self.intensity_smoother = IncrementalGaussian(
+            sigma=10, source=self.series.columns["intensity"]
+        )
+        self.pipeline = AnalysisPipeline(sigma=100)
 
         self.init_absorb = False
         self.init_plots = False
@@ -78,6 +84,7 @@ class App(ttk.Frame):
         self.y_abs = []
 
         self.dark_file, self.bright_file = None, None
+        self.dark_library, self.bright_library = None, None
 
         if os.path.exists("data"):
             self.folder_path = "data"
@@ -161,8 +168,11 @@ class App(ttk.Frame):
         self.signal_generator = SignalGenerator(int_time=self.int_time)
         self.signal_generator.start()
         self.x = self.signal_generator.generate_x()
+        self.axis = self.signal_generator.axis
         self.y = self.signal_generator.generate_y()
-        self.y_s = gaussian_filter1d(self.y, sigma=100)
+        self.last_ts = time.monotonic()
+        self.pipeline.set_axis(self.axis)
+        self.y_s = self.pipeline.smooth(self.y)
         self.plot1_real.set_data(self.x, self.y_s)
         self.ax1.relim()
         self.ax1.autoscale_view()
@@ -181,7 +191,8 @@ class App(ttk.Frame):
         if self.running == True:
             self.x = self.signal_generator.generate_x()
             self.y = self.signal_generator.generate_y()
-            self.y_s = gaussian_filter1d(self.y, sigma=100)
+            self.last_ts = time.monotonic()
+            self.pipeline.smooth(self.y)
             self.plot1_real.set_data(self.x, self.y_s)
             self.canvas1.mpl_connect("scroll_event", self.on_scroll)
             self.canvas1.draw()
@@ -199,7 +210,9 @@ class App(ttk.Frame):
     def save_dark(self):
         ininame = make_dark_file()
         file_path = filedialog.asksaveasfile(
-            initialfile=ininame, defaultextension=".csv"
+            initialfile=ininame,
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Spectrum", "*.npz")],
         )
         save_file(self.x, self.y, file_path)
         self.build_dark_block()
@@ -207,7 +220,9 @@ class App(ttk.Frame):
     def save_bright(self):
         ininame = make_bright_file()
         file_path = filedialog.asksaveasfile(
-            initialfile=ininame, defaultextension=".csv"
+            initialfile=ininame,
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Spectrum", "*.npz")],
         )
         save_file(self.x, self.y, file_path)
         self.build_bright_block()
@@ -268,7 +283,8 @@ class App(ttk.Frame):
 
         var = tk.StringVar()
         if self.dark_folder:
-            filenames = os.listdir(self.dark_folder)[::-1]
+            self.dark_library = self.open_library(self.dark_library, self.dark_folder)
+            filenames = self.dark_library.names()[::-1]
             for file in filenames:
                 b = ttk.Checkbutton(
                     scrollable_frame,
@@ -282,6 +298,12 @@ class App(ttk.Frame):
             label = ttk.Label(scrollable_frame, text="请选择暗光谱文件夹。")
             label.pack(side=tk.LEFT, fill=tk.BOTH, expand=tk.TRUE, padx=10)
 
+    def open_library(self, library, folder):
+        if library is None or library.folder != folder:
+            return SpectrumLibrary(folder, sigma=self.pipeline.sigma)
+        library.refresh()
+        return library
+
     def bind_mousewheel_dark(self, event):
         """Bind the mousewheel scroll to the canvas"""
         self.dark_canvas.bind_all("<MouseWheel>", self.on_mousewheel_dark)
@@ -304,8 +326,9 @@ class App(ttk.Frame):
     def load_dark(self, file_path):
         self.dark_file = os.path.join(self.dark_folder, file_path.get())
         try:
-            self.x_dark, self.y_dark = load_file(self.dark_file)
-            self.y_darks = gaussian_filter1d(self.y_dark, sigma=100)
+            spectrum = self.dark_library.load(file_path.get())
+            self.x_dark, self.y_dark = spectrum.x, spectrum.y
+            self.y_darks = self.pipeline.set_dark(self.y_dark, spectrum.y_smooth)
             self.plot1_dark.set_data(self.x_dark, self.y_darks)
             self.ax1.relim()
             self.ax1.autoscale_view()
@@ -373,7 +396,10 @@ class App(ttk.Frame):
 
         var = tk.StringVar()
         if self.bright_folder:
-            filenames = os.listdir(self.bright_folder)[::-1]
+            self.bright_library = self.open_library(
+                self.bright_library, self.bright_folder
+            )
+            filenames = self.bright_library.names()[::-1]
             for file in filenames:
                 b = ttk.Checkbutton(
                     scrollable_frame,
@@ -411,8 +437,11 @@ class App(ttk.Frame):
     def load_bright(self, file_path):
         self.bright_file = os.path.join(self.bright_folder, file_path.get())
         try:
-            self.x_ref, self.y_ref = load_file(self.bright_file)
-            self.y_refs = gaussian_filter1d(self.y_ref, sigma=100)
+            spectrum = self.bright_library.load(file_path.get())
+            self.x_ref, self.y_ref = spectrum.x, spectrum.y
+            self.y_refs = self.pipeline.set_ref(
+                self.x_ref, self.y_ref, spectrum.y_smooth
+            )
             self.plot1_ref.set_data(self.x_ref, self.y_refs)
             self.ax1.relim()
             self.ax1.autoscale_view()
@@ -512,8 +541,8 @@ class App(ttk.Frame):
         self.sample_time = int(self.sample_entry.get())
         self.diff = int(self.diff_entry.get())
         self.position = int(self.position_entry.get())
-        closest_x = self.find_interval(self.x, self.position)
-        self.idx_y = list(self.x).index(closest_x)
+        self.pipeline.diff = self.diff
+        self.pipeline.set_position(self.position)
 
         self.calculate_ref_area()
 
@@ -523,26 +552,13 @@ class App(ttk.Frame):
 
     def calculate_ref_area(self):
         self.range_low = int(self.range1.get())
-        closest_range1 = self.find_interval(self.x, self.range_low)
-        self.range1_idx = list(self.x).index(closest_range1)
-
         self.range_high = int(self.range2.get())
-        closest_range2 = self.find_interval(self.x, self.range_high)
-        self.range2_idx = list(self.x).index(closest_range2)
-
-        self.area_ref = np.dot(
-            self.x_ref[self.range1_idx : self.range2_idx],
-            self.y_refs[self.range1_idx : self.range2_idx],
-        )
+        self.pipeline.set_area_range(self.range_low, self.range_high)
 
     def clean_plots(self):
-        self.times, self.centroids, self.intensities, self.mins, self.area_ratios = (
-            [],
-            [],
-            [],
-            [],
-            [],
-        )
+        self.series.clear()
+        self.centroid_smoother.clear()
+        self.intensity_smoother.clear()
         self.plot3_time.set_data([], [])
         self.canvas3.draw()
         self.plot4_intensity.set_data([], [])
@@ -856,43 +872,35 @@ class App(ttk.Frame):
         self.canvas2.draw()
 
     def auto_rescale3(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
+        values = self.series["centroid"]
+        xmax = ((len(values) - 1) // self.scale_factor_x + 1) * self.scale_factor_x
         self.ax3.set_xlim(0, xmax)
-        delta = max(self.centroids) - min(self.centroids)
-        self.ax3.set_ylim(
-            min(self.centroids) - 0.1 * delta,
-            max(self.centroids) + 0.1 * delta,
-        )
+        delta = values.max() - values.min()
+        self.ax3.set_ylim(values.min() - 0.1 * delta, values.max() + 0.1 * delta)
         self.canvas3.draw()
 
     def auto_rescale4(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
+        values = self.series["intensity"]
+        xmax = ((len(values) - 1) // self.scale_factor_x + 1) * self.scale_factor_x
         self.ax4.set_xlim(0, xmax)
-        delta = max(self.intensities) - min(self.intensities)
-        self.ax4.set_ylim(
-            min(self.intensities) - 0.1 * delta,
-            max(self.intensities) + 0.1 * delta,
-        )
+        delta = values.max() - values.min()
+        self.ax4.set_ylim(values.min() - 0.1 * delta, values.max() + 0.1 * delta)
         self.canvas4.draw()
 
     def auto_rescale5(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
+        values = self.series["min"]
+        xmax = ((len(values) - 1) // self.scale_factor_x + 1) * self.scale_factor_x
         self.ax5.set_xlim(0, xmax)
-        delta = max(self.mins) - min(self.mins)
-        self.ax5.set_ylim(
-            min(self.mins) - 0.1 * delta,
-            max(self.mins) + 0.1 * delta,
-        )
+        delta = values.max() - values.min()
+        self.ax5.set_ylim(values.min() - 0.1 * delta, values.max() + 0.1 * delta)
         self.canvas5.draw()
 
     def auto_rescale6(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
+        values = self.series["area_ratio"]
+        xmax = ((len(values) - 1) // self.scale_factor_x + 1) * self.scale_factor_x
         self.ax6.set_xlim(0, xmax)
-        delta = max(self.area_ratios) - min(self.area_ratios)
-        self.ax6.set_ylim(
-            min(self.area_ratios) - 0.1 * delta,
-            max(self.area_ratios) + 0.1 * delta,
-        )
+        delta = values.max() - values.min()
+        self.ax6.set_ylim(values.min() - 0.1 * delta, values.max() + 0.1 * delta)
         self.canvas6.draw()
 
     def _make_absorb(self):
@@ -901,14 +909,8 @@ class App(ttk.Frame):
         self.y_abs = self.df[f"Ratio_{i}"].values
 
     def make_absorb(self):
-        self.x_ab = self.x[:3000]
-        self.y_abs = (
-            abs(
-                (self.y_s[:3000] - self.y_darks[:3000])
-                / (self.y_refs[:3000] - self.y_darks[:3000])
-            )
-            * 100
-        )
+        self.x_ab = self.pipeline.x_ab
+        self.y_abs = self.pipeline.make_absorb()
 
     def init_ratio(self):
         if (len(self.y_refs) > 0) and (len(self.y_darks) > 0):
@@ -926,35 +928,28 @@ class App(ttk.Frame):
 
     def update_plots(self):
         if self.ts_running == True:
-            self.make_absorb()
-            self.min_idx = self.find_minimum(self.y_abs)
-
-            if self.fix_minimum == False:
-                self.min_idx_display = self.min_idx
-                self.update_min_value()
-
             try:
-                self.centroid_x, self.centroid_y = self.find_centroid(
-                    x=self.x_ab,
-                    y=self.y_abs,
-                    min_idx=self.min_idx_display,
-                    diff=self.diff,
-                )
-                self.centroids.append(self.centroid_x)
-                self.centroids_sm = gaussian_filter1d(self.centroids, sigma=10)
-
-                self.intensities.append(self.y_abs[self.idx_y])
-                self.intensities_sm = gaussian_filter1d(self.intensities, sigma=10)
-
-                self.mins.append(self.x_ab[self.min_idx])
-
-                area_current = np.dot(
-                    self.x[self.range1_idx : self.range2_idx],
-                    self.y_s[self.range1_idx : self.range2_idx],
+                metrics = self.pipeline.analyze()
+                self.x_ab, self.y_abs = self.pipeline.x_ab, self.pipeline.y_abs
+                self.min_idx = metrics.min_idx
+
+                if self.fix_minimum == False:
+                    self.min_idx_display = self.min_idx
+                    self.update_min_value()
+
+                self.centroid_x = metrics.centroid_x
+                self.centroid_y = metrics.centroid_y
+                self.series.append(
+                    self.last_ts,
+                    centroid=self.centroid_x,
+                    intensity=metrics.intensity,
+                    min=metrics.min_wavelength,
+                    area_ratio=metrics.area_ratio,
                 )
-                self.area_ratios.append(area_current / self.area_ref * 100)
-
-                self.times = list(range(len(self.centroids)))
+                self.centroid_smoother.update()
+                self.centroids_sm = self.centroid_smoother.values
+                self.intensity_smoother.update()
+                self.intensities_sm = self.intensity_smoother.values
 
                 self.update_center_value()
                 if not self.init_plots:
@@ -993,25 +988,25 @@ class App(ttk.Frame):
         self.canvas2.draw()
 
     def init_plot3(self):
-        self.plot3_time.set_data(self.times, self.centroids)
+        self.plot3_time.set_data(self.series.index, self.series["centroid"])
         self.ax3.relim()
         self.ax3.autoscale_view()
         self.canvas3.draw()
 
     def init_plot4(self):
-        self.plot4_intensity.set_data(self.times, self.intensities)
+        self.plot4_intensity.set_data(self.series.index, self.series["intensity"])
         self.ax4.relim()
         self.ax4.autoscale_view()
         self.canvas4.draw()
 
     def init_plot5(self):
-        self.plot5_lowest.set_data(self.times, self.mins)
+        self.plot5_lowest.set_data(self.series.index, self.series["min"])
         self.ax5.relim()
         self.ax5.autoscale_view()
         self.canvas5.draw()
 
     def init_plot6(self):
-        self.plot6_area.set_data(self.times, self.area_ratios)
+        self.plot6_area.set_data(self.series.index, self.series["area_ratio"])
         self.ax6.relim()
         self.ax6.autoscale_view()
         self.canvas6.draw()
@@ -1024,42 +1019,46 @@ class App(ttk.Frame):
 
     def update_plot3(self):
         xmin, xmax = self.ax3.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
+        last = len(self.series) - 1
+        if last % self.scale_factor_x == 0:
+            new_xmax = last + self.scale_factor_x
             if new_xmax > xmax:
                 self.ax3.set_xlim(xmin, new_xmax)
 
-        self.plot3_time.set_data(self.times, self.centroids)
+        self.plot3_time.set_data(self.series.index, self.series["centroid"])
         self.canvas3.draw()
 
     def update_plot4(self):
         xmin, xmax = self.ax4.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
+        last = len(self.series) - 1
+        if last % self.scale_factor_x == 0:
+            new_xmax = last + self.scale_factor_x
             if new_xmax > xmax:
                 self.ax4.set_xlim(xmin, new_xmax)
 
-        self.plot4_intensity.set_data(self.times, self.intensities)
+        self.plot4_intensity.set_data(self.series.index, self.series["intensity"])
         self.canvas4.draw()
 
     def update_plot5(self):
         xmin, xmax = self.ax5.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
+        last = len(self.series) - 1
+        if last % self.scale_factor_x == 0:
+            new_xmax = last + self.scale_factor_x
             if new_xmax > xmax:
                 self.ax5.set_xlim(xmin, new_xmax)
 
-        self.plot5_lowest.set_data(self.times, self.mins)
+        self.plot5_lowest.set_data(self.series.index, self.series["min"])
         self.canvas5.draw()
 
     def update_plot6(self):
         xmin, xmax = self.ax6.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
+        last = len(self.series) - 1
+        if last % self.scale_factor_x == 0:
+            new_xmax = last + self.scale_factor_x
             if new_xmax > xmax:
                 self.ax6.set_xlim(xmin, new_xmax)
 
-        self.plot6_area.set_data(self.times, self.area_ratios)
+        self.plot6_area.set_data(self.series.index, self.series["area_ratio"])
         self.canvas6.draw()
 
     def stop_absorb(self):
@@ -1068,39 +1067,7 @@ class App(ttk.Frame):
 
     def fix_min(self):
         self.fix_minimum = not self.fix_minimum
-
-    @staticmethod
-    def find_minimum(y):
-        min_index = np.argmin(y)
-        return min_index
-
-    @staticmethod
-    def find_interval(arr, value):
-        if value < arr[0] or value >= arr[-1]:
-            return None
-
-        low, high = 0, len(arr) - 1
-        while low <= high:
-            mid = (low + high) // 2
-            if arr[mid] <= value < arr[mid + 1]:
-                return arr[mid]
-            elif value < arr[mid]:
-                high = mid - 1
-            else:
-                low = mid + 1
-
-        return None
-
-    def find_centroid(self, x, y, min_idx, diff):
-        x_min = x[min_idx]
-        xl = self.find_interval(x[:min_idx], x_min - diff)
-        xr = self.find_interval(x[min_idx:], x_min + diff)
-        il, ir = list(x).index(xl), list(x).index(xr)
-        boundary = list(
-            zip(list(x[il:ir]) + [x[ir], x[il]], list(y[il:ir]) + [100, 100])
-        )
-        polygon = Polygon(boundary)
-        return polygon.centroid.x, polygon.centroid.y
+        self.pipeline.fix_minimum = self.fix_minimum
 
     def save_data(self):
         ininame = make_results_file()
@@ -1112,53 +1079,40 @@ class App(ttk.Frame):
         self.save_to_excel(file_path.name)
 
     def save_to_excel(self, file_path):
-
-        df1 = pd.DataFrame(
-            {
-                "Wave Length": self.x_dark,
-                "Dark Intensity": self.y_dark,
-                "Dark Intensity(smooth)": self.y_darks,
-                "Reference Intensity": self.y_ref,
-                "Reference Intensity(smooth)": self.y_refs,
-            }
-        )
-
-        df2 = pd.DataFrame({"Wave Length": self.x_ab, "Ratio": self.y_abs})
-
-        df3 = pd.DataFrame(
-            {"Centroid": self.centroids, "Centroid(smooth)": self.centroids_sm}
-        )
-
-        df4 = pd.DataFrame(
-            {"Intensity": self.intensities, "Intensity(smooth)": self.intensities_sm}
-        )
-
-        df5 = pd.DataFrame({"Minimal": self.mins})
-
-        df6 = pd.DataFrame({"Ratio of area": self.area_ratios})
-
-        df7 = pd.DataFrame(
-            {
-                "积分时间(ms)": self.int_time,
-                "采样时间(ms)": self.sample_time,
-                "暗光谱": self.dark_file,
-                "参考光谱": self.bright_file,
-                "质心范围(+/-)": self.diff,
-                "强度位置": self.position,
-                "面积范围": f"{self.range_low}-{self.range_high}",
-                "固定最低点": self.x_ab[self.min_idx_display],
-                "数据文件路径": file_path,
-            }.items()
+        export = build_export(
+            file_path,
+            self.series,
+            self.centroids_sm,
+            self.intensities_sm,
+            dark=(self.x_dark, self.y_dark, self.y_darks),
+            ref=(self.y_ref, self.y_refs),
+            absorbance=(self.x_ab, self.y_abs),
+            params=ExportParameters(
+                int_time=self.int_time,
+                sample_time=self.sample_time,
+                dark_file=self.dark_file,
+                ref_file=self.bright_file,
+                diff=self.diff,
+                position=self.position,
+                range_low=self.range_low,
+                range_high=self.range_high,
+                min_wavelength=self.x_ab[self.min_idx_display],
+            ),
         )
-
-        with pd.ExcelWriter(path=file_path) as writer:
-            df1.to_excel(writer, sheet_name="光谱", index=False)
-            df2.to_excel(writer, sheet_name="吸收", index=False)
-            df3.to_excel(writer, sheet_name="时序", index=False)
-            df4.to_excel(writer, sheet_name="强度", index=False)
-            df5.to_excel(writer, sheet_name="最低点", index=False)
-            df6.to_excel(writer, sheet_name="面积比", index=False)
-            df7.to_excel(writer, sheet_name="参数", index=False)
+        ExportJob(
+            export.sheets,
+            file_path,
+            table=export.table,
+            parquet_path=export.parquet_path,
+            metadata=export.parameters,
+            on_done=self.export_done,
+        ).start()
+
+    def export_done(self, file_path, errors):
+        # called from the export thread, hand over to the Tk event loop
+        if errors:
+            message = "\n".join(f"{path}\n{error}" for path, error in errors.items())
+            self.after(0, messagebox.showwarning, "保存失败", message)
 
     def on_scroll(self, event):
         ax = event.inaxes
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class WavelengthAxis:
+    """Wavelength calibration of one device session.
+
+    Built once when the spectrometer is opened; the arrays are read-only so
+    every consumer can share them without copying.
+    """
+
+    def __init__(self, wavelengths):
+        self.values = np.array(wavelengths, dtype=np.float64)
+        self.values.setflags(write=False)
+        self.spacing = np.diff(self.values)
+        self.spacing.setflags(write=False)
+        self.start = float(self.values[0])
+        self.stop = float(self.values[-1])
+
+    def __len__(self):
+        return len(self.values)
+
+    def index(self, value, start: int = 0, stop: int = None):
+        """Index i in [start, stop) with values[i] <= value < values[i + 1].
+
+        Raises ValueError when value lies outside
+        [values[start], values[stop - 1]).
+        """
+        stop = len(self.values) if stop is None else stop
+        if stop - start < 2:
+            raise ValueError("Need at least two samples to locate a wavelength")
+        if not self.values[start] <= value < self.values[stop - 1]:
+            raise ValueError(f"{value} is outside the wavelength range")
+        return int(np.searchsorted(self.values, value, side="right")) - 1
+
+    def indices(self, values):
+        """index() for an array of wavelengths, -1 where out of range."""
+        idx = np.searchsorted(self.values, values, side="right") - 1
+        idx[(idx < 0) | (idx >= len(self.values) - 1)] = -1
+        return idx
+
+    def slice(self, low, high):
+        """Slice of the samples between the wavelengths low and high."""
+        return slice(self.index(low), self.index(high))
@@ -0,0 +1,127 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from analysis import area_centroid
+from smoothing import smooth_spectrum
+
+
+class FrameMetrics(NamedTuple):
+    min_idx: int
+    min_wavelength: float
+    centroid_x: float
+    centroid_y: float
+    intensity: float
+    area_ratio: float
+
+
+class AnalysisPipeline:
+    """GUI-independent per-frame analysis.
+
+    Holds the smoothed dark and reference spectra plus preallocated frame
+    buffers; ``process`` takes a raw frame and returns all per-frame
+    metrics. The front ends only read ``y_s``/``y_abs`` for plotting.
+    """
+
+    def __init__(self, axis=None, sigma: float = 100, n_absorb: int = 3000):
+        self.sigma = sigma
+        self.n_absorb = n_absorb
+        self.diff = 25
+        self.fix_minimum = False
+        self.min_idx_display = None
+        self.idx_y = None
+        self.area_range = None
+        self.area_ref = None
+        self.y_darks = None
+        self.y_refs = None
+        self.x_ref = None
+        self.denominator = None
+        self.axis = None
+        if axis is not None:
+            self.set_axis(axis)
+
+    def set_axis(self, axis):
+        self.axis = axis
+        self.x = axis.values
+        self.x_ab = self.x[: self.n_absorb]
+        self.y_s = np.zeros(len(axis))
+        self.y_abs = np.zeros(len(self.x_ab))
+
+    @property
+    def ready(self):
+        return self.y_darks is not None and self.y_refs is not None
+
+    def set_dark(self, y_dark, y_smooth=None):
+        """Use a dark spectrum, ``y_smooth`` if it was already smoothed."""
+        if y_smooth is None:
+            y_smooth = smooth_spectrum(y_dark, sigma=self.sigma)
+        self.y_darks = y_smooth
+        self._update_denominator()
+        return self.y_darks
+
+    def set_ref(self, x_ref, y_ref, y_smooth=None):
+        self.x_ref = x_ref
+        if y_smooth is None:
+            y_smooth = smooth_spectrum(y_ref, sigma=self.sigma)
+        self.y_refs = y_smooth
+        self._update_denominator()
+        return self.y_refs
+
+    def _update_denominator(self):
+        if self.ready:
+            n = self.n_absorb
+            self.denominator = self.y_refs[:n] - self.y_darks[:n]
+
+    def set_position(self, position):
+        self.idx_y = self.axis.index(position)
+
+    def set_area_range(self, range_low, range_high):
+        self.area_range = self.axis.slice(range_low, range_high)
+        self.area_ref = np.dot(
+            self.x_ref[self.area_range], self.y_refs[self.area_range]
+        )
+
+    def smooth(self, y):
+        return smooth_spectrum(y, sigma=self.sigma, out=self.y_s)
+
+    def make_absorb(self):
+        n = len(self.y_abs)
+        np.subtract(self.y_s[:n], self.y_darks[:n], out=self.y_abs)
+        np.divide(self.y_abs, self.denominator[:n], out=self.y_abs)
+        np.abs(self.y_abs, out=self.y_abs)
+        self.y_abs *= 100
+        return self.y_abs
+
+    def find_centroid(self, min_idx, diff):
+        x = self.x_ab
+        x_min = x[min_idx]
+        il = self.axis.index(x_min - diff, stop=min_idx)
+        ir = self.axis.index(x_min + diff, start=min_idx, stop=len(x))
+        return area_centroid(x, self.y_abs, il, ir, base=100)
+
+    def analyze(self):
+        """Metrics of the frame currently held in ``y_s``.
+
+        Raises ValueError or IndexError when the centroid window, intensity
+        position or area range fall outside the absorbance range.
+        """
+        self.make_absorb()
+        min_idx = int(np.argmin(self.y_abs))
+        if not self.fix_minimum or self.min_idx_display is None:
+            self.min_idx_display = min_idx
+
+        centroid_x, centroid_y = self.find_centroid(self.min_idx_display, self.diff)
+        intensity = self.y_abs[self.idx_y]
+        area_current = np.dot(self.x[self.area_range], self.y_s[self.area_range])
+        return FrameMetrics(
+            min_idx=min_idx,
+            min_wavelength=self.x_ab[min_idx],
+            centroid_x=centroid_x,
+            centroid_y=centroid_y,
+            intensity=intensity,
+            area_ratio=area_current / self.area_ref * 100,
+        )
+
+    def process(self, y):
+        self.smooth(y)
+        return self.analyze()
@@ -0,0 +1,106 @@
+import numpy as np
+
+from timeseries import GrowableArray, grow
+
+
+class _Level:
+    def __init__(self, block, lo, hi, ilo, ihi):
+        self.block = block
+        self.lo = np.array([lo])
+        self.hi = np.array([hi])
+        self.ilo = np.array([ilo])
+        self.ihi = np.array([ihi])
+        self.count = 1
+
+    def update(self, i, value):
+        b = i // self.block
+        if b == self.count:
+            self.lo = grow(self.lo, b + 1)
+            self.hi = grow(self.hi, b + 1)
+            self.ilo = grow(self.ilo, b + 1)
+            self.ihi = grow(self.ihi, b + 1)
+            self.lo[b] = self.hi[b] = value
+            self.ilo[b] = self.ihi[b] = i
+            self.count += 1
+        elif value < self.lo[b]:
+            self.lo[b], self.ilo[b] = value, i
+        elif value > self.hi[b]:
+            self.hi[b], self.ihi[b] = value, i
+
+
+class MinMaxPyramid:
+    """Min/max level-of-detail summary of an append-only series.
+
+    Level k keeps, for every block of ``factor ** k`` samples, the minimum
+    and maximum with their positions; appending touches one block per
+    level. ``query`` returns at most about ``n_points`` samples for an index
+    range, keeping every extreme, so spikes survive decimation.
+
+    With ``source`` (a timeseries.GrowableArray, e.g. a TimeSeriesStore
+    column) the samples are read from it instead of being copied; call
+    ``update`` after appending there.
+    """
+
+    def __init__(
+        self, factor: int = 4, capacity: int = 1024, source: GrowableArray = None
+    ):
+        self.factor = factor
+        self.source = source if source is not None else GrowableArray(capacity)
+        self.count = 0
+        self.levels = []
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def values(self):
+        return self.source.values
+
+    def append(self, value):
+        self.source.append(value)
+        self.update()
+
+    def update(self):
+        """Summarize the samples appended to the source since the last call."""
+        if len(self.source) < self.count:
+            self.clear()  # source was cleared
+        data = self.source.data
+        while self.count < len(self.source):
+            i = self.count
+            value = data[i]
+            self.count += 1
+            for level in self.levels:
+                level.update(i, value)
+
+            block = self.factor ** (len(self.levels) + 1)
+            if self.count > block // self.factor and self.count > 1:
+                # top level outgrew a single block, summarize one level up
+                ilo = int(np.argmin(data[: self.count]))
+                ihi = int(np.argmax(data[: self.count]))
+                self.levels.append(_Level(block, data[ilo], data[ihi], ilo, ihi))
+
+    def query(self, start, stop, n_points):
+        """(indices, values) covering samples [start, stop) in ~n_points."""
+        start, stop = max(0, int(start)), min(self.count, int(stop))
+        if stop <= start:
+            return np.empty(0, dtype=int), np.empty(0)
+        span = stop - start
+        if span <= n_points or not self.levels:
+            indices = np.arange(start, stop)
+            return indices, self.values[start:stop]
+
+        level = self.levels[-1]
+        for candidate in self.levels:
+            if span / candidate.block <= n_points / 2:
+                level = candidate
+                break
+        b0, b1 = start // level.block, (stop - 1) // level.block + 1
+        ilo, ihi = level.ilo[b0:b1], level.ihi[b0:b1]
+        indices = np.empty(2 * len(ilo), dtype=int)
+        indices[0::2] = np.minimum(ilo, ihi)
+        indices[1::2] = np.maximum(ilo, ihi)
+        return indices, self.values[indices]
+
+    def clear(self):
+        self.count = 0
+        self.levels = []
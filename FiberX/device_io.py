@@ -1,10 +1,13 @@
 from ctypes import *
+import functools
 import numpy as np
 import sys
 import os
 
 import time
 
+from axis import WavelengthAxis
+
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -12,49 +15,132 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+class SeaBreezeBackend:
+    """Spectrometer access through the SeaBreeze DLL.
+
+    Every backend exposes the same small set of calls; spectra and
+    wavelengths are written into caller-supplied float64 arrays.
+    """
+
+    def __init__(self, source_path: str = ".\\SeaBreeze.dll"):
+        self.source_path = source_path
+
+    @functools.cached_property
+    def lib(self):
+        # loaded on the first device call rather than at construction
+        return cdll.LoadLibrary(self.source_path)
+
+    def open(self):
+        return self.lib.seabreeze_open_all_spectrometers(0)
+
+    def close(self):
+        self.lib.seabreeze_close_all_spectrometers(0)
+
+    def set_integration_time(self, index, microsec):
+        self.lib.seabreeze_set_integration_time_microsec(index, 0, microsec)
+
+    def set_laser_power(self, index, power):
+        self.lib.seabreeze_set_laser_power(index, 0, power)
+
+    def read_wavelengths(self, index, out):
+        self.lib.seabreeze_get_wavelengths(
+            index, 0, out.ctypes.data_as(POINTER(c_double)), len(out)
+        )
+
+    def read_spectrum(self, index, out):
+        self.lib.seabreeze_get_formatted_spectrum(
+            index, 0, out.ctypes.data_as(POINTER(c_double)), len(out)
+        )
+
+
+def make_backend(name: str = "seabreeze", **kwargs):
+    """Create a backend by name: ``seabreeze``, ``simulator`` or ``replay``."""
+    if name == "seabreeze":
+        return SeaBreezeBackend(**kwargs)
+    if name == "simulator":
+        from simulator import SimulatedBackend
+
+        return SimulatedBackend(**kwargs)
+    if name == "replay":
+        from replay import ReplayBackend
+
+        return ReplayBackend(**kwargs)
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def backend_from_env(environ=os.environ):
+    """Backend selected by FIBERX_BACKEND, replay reads FIBERX_REPLAY(_SPEED)."""
+    name = environ.get("FIBERX_BACKEND", "seabreeze")
+    if name == "replay":
+        speed = float(environ.get("FIBERX_REPLAY_SPEED", 1.0))
+        return make_backend(
+            name, source=environ["FIBERX_REPLAY"], speed=speed or None, loop=True
+        )
+    return make_backend(name)
+
+
 class SignalGenerator:
-    def __init__(self, int_time: int = 100):
+    def __init__(self, int_time: int = 100, backend=None):
         self.index = 0
-        self.n_length = 4096
+        self.backend = backend if backend is not None else SeaBreezeBackend()
+        self.n_length = getattr(self.backend, "n_length", 4096)
         self.int_time = int_time
-        source_path = ".\SeaBreeze.dll"
-        self.lib = cdll.LoadLibrary(source_path)
         self.devcount = self.open_spectrometers()
-        self.lib.seabreeze_set_laser_power(0, 0, 500)
-        self.wavelength = (c_double * self.n_length)()
-        self.lightspec = (c_double * self.n_length)()
+        self.backend.set_laser_power(0, 500)
+        # the backend writes straight into these buffers
+        self.wavelength = np.zeros(self.n_length)
+        self.lightspec = np.zeros(self.n_length)
+        self.axis = None
 
     def start(self):
         if self.devcount == 0:
             print("请打开光谱仪。")
         else:
             # 设置积分时间
-            self.lib.seabreeze_set_integration_time_microsec(
-                self.index, 0, self.int_time * self.int_time
+            self.backend.set_integration_time(
+                self.index, self.int_time * self.int_time
             )
 
             # 获取波长
-            self.lib.seabreeze_get_wavelengths(
-                self.index, 0, self.wavelength, self.n_length
-            )
-            self.lib.seabreeze_set_laser_power(self.index, 0, 0)
+            self.backend.read_wavelengths(self.index, self.wavelength)
+            self.axis = WavelengthAxis(self.wavelength)
+            self.backend.set_laser_power(self.index, 0)
 
     def open_spectrometers(self):
-        self.lib.seabreeze_open_all_spectrometers(0)
+        self.backend.open()
 
     def close_spectrometers(self):
         # 关闭光谱仪
         # self.lib.seabreeze_set_laser_switch(self.index, 0, 0)
-        self.lib.seabreeze_close_all_spectrometers(0)
+        self.backend.close()
 
     def generate_x(self):
-        return np.array(self.wavelength)
+        return self.axis.values
 
     def generate_y(self):
-        self.lib.seabreeze_get_formatted_spectrum(
-            self.index, 0, self.lightspec, self.n_length
-        )
-        return np.array(self.lightspec)
+        return self.read_y().copy()
+
+    def read_y(self, out=None):
+        """Read one spectrum with a single backend call and no per-element copy.
+
+        With ``out`` the backend writes straight into that float64 array,
+        otherwise the internal buffer is returned, which the next read
+        overwrites.
+        """
+        if out is None:
+            self.backend.read_spectrum(self.index, self.lightspec)
+            return self.lightspec
+
+        if (
+            out.dtype != np.float64
+            or not out.flags.c_contiguous
+            or out.shape != (self.n_length,)
+        ):
+            raise ValueError(
+                f"out must be a contiguous float64 array of length {self.n_length}"
+            )
+        self.backend.read_spectrum(self.index, out)
+        return out
 
 
 if __name__ == "__main__":
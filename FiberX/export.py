@@ -0,0 +1,262 @@
+import importlib.util
+import json
+import math
+import os
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+# worksheet limit, header row included
+EXCEL_MAX_ROWS = 1048576
+# rows per Parquet row group, the unit readers can load on its own
+PARQUET_ROW_GROUP = 1 << 18
+
+
+class Sheet(NamedTuple):
+    title: str
+    header: list
+    columns: list
+
+
+def sheet(title, columns: dict):
+    """Sheet holding a copy of the given columns, safe to write from a thread.
+
+    Columns longer than a worksheet allows are cut at EXCEL_MAX_ROWS; the
+    Parquet output keeps every row.
+    """
+    limit = EXCEL_MAX_ROWS - 1
+    return Sheet(
+        title,
+        list(columns),
+        [np.array(values[:limit]).tolist() for values in columns.values()],
+    )
+
+
+def parameter_sheet(title, parameters: dict):
+    # same layout pandas gives a DataFrame built from dict.items()
+    return Sheet(title, [0, 1], [list(parameters), list(parameters.values())])
+
+
+def _cell(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def write_excel(sheets, file_path):
+    """Stream the sheets into an .xlsx with a write-only openpyxl workbook."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for title, header, columns in sheets:
+        worksheet = workbook.create_sheet(title)
+        worksheet.append(header)
+        for row in zip(*columns):
+            worksheet.append([_cell(value) for value in row])
+    workbook.save(file_path)
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def series_table(timestamps, columns: dict):
+    """Columns for the Parquet output of a time series.
+
+    ``timestamp`` is the monotonic clock of each sample and ``time`` the
+    seconds since the first one, so gaps and timer jitter stay visible.
+    """
+    timestamps = np.array(timestamps, dtype=float)
+    start = timestamps[0] if len(timestamps) else 0.0
+    table = {"timestamp": timestamps, "time": timestamps - start}
+    for name, values in columns.items():
+        table[name] = np.array(values, dtype=float)
+    return table
+
+
+def write_parquet(
+    columns: dict, file_path, metadata: dict = None, row_group_size=PARQUET_ROW_GROUP
+):
+    """Write equal-length columns to Parquet, metadata as JSON in the schema.
+
+    Rows go out one row group at a time, so pandas or pyarrow can later read
+    selected columns or row groups without loading the whole file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {
+        name: np.ascontiguousarray(values) for name, values in columns.items()
+    }
+    schema = pa.schema(
+        [(name, pa.from_numpy_dtype(values.dtype)) for name, values in columns.items()]
+    )
+    if metadata:
+        schema = schema.with_metadata({"fiberx": json.dumps(metadata, default=str)})
+    n_rows = len(next(iter(columns.values()), ()))
+    with pq.ParquetWriter(file_path, schema, compression="zstd") as writer:
+        for start in range(0, n_rows, row_group_size):
+            stop = start + row_group_size
+            writer.write_table(
+                pa.table(
+                    {name: values[start:stop] for name, values in columns.items()},
+                    schema=schema,
+                )
+            )
+
+
+def read_parquet_metadata(file_path):
+    """Parameters stored by write_parquet, without reading any rows."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(file_path).metadata or {}
+    return json.loads(metadata.get(b"fiberx", b"{}"))
+
+
+class ExportParameters(NamedTuple):
+    """Run settings written to the parameter sheet and the Parquet metadata."""
+
+    int_time: int
+    sample_time: int
+    dark_file: str
+    ref_file: str
+    diff: float
+    position: float
+    range_low: float
+    range_high: float
+    min_wavelength: float
+
+
+class Export(NamedTuple):
+    sheets: list
+    table: dict
+    parquet_path: str
+    parameters: dict
+
+
+def build_export(
+    file_path,
+    series,
+    centroid_smooth,
+    intensity_smooth,
+    dark,
+    ref,
+    absorbance,
+    params: ExportParameters,
+):
+    """Sheets, Parquet columns and parameters of one results file.
+
+    ``series`` is the TimeSeriesStore of the run, ``dark`` the (x, y,
+    y_smooth) dark spectrum, ``ref`` the (y, y_smooth) reference and
+    ``absorbance`` its (x, y). Everything is copied, so the result can be
+    written from another thread. ``table`` and ``parquet_path`` are None
+    without pyarrow.
+    """
+    timestamps = series.timestamps
+    t = timestamps - timestamps[0] if len(series) else timestamps
+    parameters = {
+        "积分时间(ms)": params.int_time,
+        "采样时间(ms)": params.sample_time,
+        "暗光谱": params.dark_file,
+        "参考光谱": params.ref_file,
+        "质心范围(+/-)": params.diff,
+        "强度位置": params.position,
+        "面积范围": f"{params.range_low}-{params.range_high}",
+        "固定最低点": params.min_wavelength,
+        "数据文件路径": file_path,
+    }
+    x_dark, y_dark, y_dark_smooth = dark
+    y_ref, y_ref_smooth = ref
+    sheets = [
+        sheet(
+            "光谱",
+            {
+                "Wave Length": x_dark,
+                "Dark Intensity": y_dark,
+                "Dark Intensity(smooth)": y_dark_smooth,
+                "Reference Intensity": y_ref,
+                "Reference Intensity(smooth)": y_ref_smooth,
+            },
+        ),
+        sheet("吸收", {"Wave Length": absorbance[0], "Ratio": absorbance[1]}),
+        sheet(
+            "时序",
+            {
+                "time": t,
+                "Centroid": series["centroid"],
+                "Centroid(smooth)": centroid_smooth,
+            },
+        ),
+        sheet(
+            "强度",
+            {
+                "time": t,
+                "Intensity": series["intensity"],
+                "Intensity(smooth)": intensity_smooth,
+            },
+        ),
+        sheet("最低点", {"time": t, "Minimal": series["min"]}),
+        sheet("面积比", {"time": t, "Ratio of area": series["area_ratio"]}),
+        parameter_sheet("参数", parameters),
+    ]
+
+    table, parquet_path = None, None
+    if parquet_available():
+        table = series_table(
+            timestamps,
+            {
+                "centroid": series["centroid"],
+                "centroid_smooth": centroid_smooth,
+                "intensity": series["intensity"],
+                "intensity_smooth": intensity_smooth,
+                "min": series["min"],
+                "area_ratio": series["area_ratio"],
+            },
+        )
+        parquet_path = os.path.splitext(file_path)[0] + ".parquet"
+    return Export(sheets, table, parquet_path, parameters)
+
+
+class ExportJob(threading.Thread):
+    """Write a results snapshot off the GUI thread.
+
+    ``sheets`` go to the workbook; ``table`` (equal-length columns) also
+    goes to ``parquet_path`` when given. The Parquet file is written first
+    and on its own, so the full-resolution data is saved even when the
+    workbook cannot be (e.g. the old file is still open in Excel).
+    ``on_done(file_path, errors)`` gets a dict of failed output path to
+    exception, empty on success. It is called from the worker thread, so
+    GUI code should pass a Qt signal's ``emit``.
+    """
+
+    def __init__(
+        self,
+        sheets,
+        file_path,
+        table=None,
+        parquet_path=None,
+        metadata=None,
+        on_done=None,
+    ):
+        super().__init__(daemon=True)
+        self.sheets = sheets
+        self.file_path = file_path
+        self.table = table
+        self.parquet_path = parquet_path
+        self.metadata = metadata
+        self.on_done = on_done
+        self.errors = {}
+
+    def run(self):
+        if self.parquet_path and self.table is not None:
+            try:
+                write_parquet(self.table, self.parquet_path, self.metadata)
+            except Exception as e:
+                self.errors[self.parquet_path] = e
+        try:
+            write_excel(self.sheets, self.file_path)
+        except Exception as e:
+            self.errors[self.file_path] = e
+        if self.on_done is not None:
+            self.on_done(self.file_path, self.errors)
@@ -1,22 +1,58 @@
-import pandas as pd
+import numpy as np
+import json
 import time
 import os
 
+SPECTRUM_EXTENSIONS = (".csv", ".npz")
+
+
+def is_npz(file_path):
+    return str(getattr(file_path, "name", file_path)).lower().endswith(".npz")
+
+
+def save_file(x, y, file_path, metadata=None):
+    """Save a spectrum as CSV, or as binary .npz with metadata.
+
+    The .npz keeps full float64 precision and stores ``metadata`` (device,
+    integration time, timestamp, smoothing, ...) as JSON next to the arrays.
+    """
+    if is_npz(file_path):
+        if hasattr(file_path, "close"):
+            file_path.close()
+            file_path = file_path.name
+        np.savez_compressed(
+            file_path,
+            wavelength=np.asarray(x, dtype=np.float64),
+            intensity=np.asarray(y, dtype=np.float64),
+            metadata=np.array(json.dumps(metadata or {})),
+        )
+        return
+    import pandas as pd
 
-def save_file(x, y, file_path):
     df = pd.DataFrame({"wavelength": x, "intensity": y})
     df.to_csv(file_path, lineterminator="\n")
 
 
-def load_file(file_path):
+def load_spectrum(file_path):
+    """(x, y, metadata) of a CSV or .npz spectrum; CSVs have no metadata."""
+    if is_npz(file_path):
+        with np.load(file_path) as f:
+            metadata = json.loads(str(f["metadata"])) if "metadata" in f else {}
+            return f["wavelength"], f["intensity"], metadata
+    import pandas as pd
+
     df = pd.read_csv(file_path)
-    x, y = df["wavelength"].values, df["intensity"].values
+    return df["wavelength"].values, df["intensity"].values, {}
+
+
+def load_file(file_path):
+    x, y, _ = load_spectrum(file_path)
     return x, y
 
 
-def make_dark_file():
+def make_dark_file(ext=".csv"):
     timestr = time.strftime("%y%m%d-%H%M%S")
-    filename = "dark-" + timestr + ".csv"
+    filename = "dark-" + timestr + ext
     return filename
 
 
@@ -26,12 +62,20 @@ def save_dark_file(x, y, folder):
     save_file(x, y, file_path=path)
 
 
-def make_bright_file():
+def make_session_folder():
     timestr = time.strftime("%y%m%d-%H%M%S")
-    filename = "bright-" + timestr + ".csv"
+    return "session-" + timestr
+
+
+def make_bright_file(ext=".csv"):
+    timestr = time.strftime("%y%m%d-%H%M%S")
+    filename = "bright-" + timestr + ext
     return filename
 
 
+make_ref_file = make_bright_file
+
+
 def save_bright_file(x, y, folder):
     filename = make_bright_file()
     path = os.path.join(folder, filename)
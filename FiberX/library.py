@@ -0,0 +1,183 @@
+import json
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+from file_io import SPECTRUM_EXTENSIONS, load_spectrum
+from smoothing import smooth_spectrum
+
+INDEX_FILE = ".fiberx-index.json"
+INDEX_VERSION = 1
+
+_NAME_TIME = re.compile(r"(\d{6}-\d{6})")
+
+
+def parse_name_time(filename):
+    """ISO time from a ``dark-YYMMDD-HHMMSS`` style name, None if absent."""
+    match = _NAME_TIME.search(filename)
+    if match is None:
+        return None
+    try:
+        parsed = time.strptime(match.group(1), "%y%m%d-%H%M%S")
+    except ValueError:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%S", parsed)
+
+
+def file_checksum(file_path, chunk_size: int = 1 << 20):
+    crc = 0
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+    return f"{crc:08x}"
+
+
+class Spectrum(NamedTuple):
+    name: str
+    x: object
+    y: object
+    y_smooth: object
+    metadata: dict
+
+
+class SpectrumLibrary:
+    """Dark or reference spectra of one folder.
+
+    ``refresh`` only scans the directory entries and compares them with the
+    index kept in the folder (name, mtime, size, time from the file name,
+    integration time, checksum), so listing a folder of thousands of files
+    does not open any of them. Checksum and integration time are filled in
+    the first time a file is loaded; a loaded file whose mtime moves but
+    whose content still matches the checksum is not reported as changed.
+    Loaded spectra are kept parsed and pre-smoothed in an LRU cache, so
+    switching back to one is free.
+    """
+
+    def __init__(self, folder, sigma: float = 100, cache_size: int = 32):
+        self.folder = folder
+        self.sigma = sigma
+        self.cache_size = cache_size
+        self.entries = {}
+        self.cache = OrderedDict()
+        self._load_index()
+        self.refresh()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.folder, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get("version") == INDEX_VERSION:
+            self.entries = index["entries"]
+
+    def _save_index(self):
+        # shared folders may be read-only, the index is only a cache
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "entries": self.entries}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def _new_entry(self, name, mtime, size):
+        return {
+            "mtime": mtime,
+            "size": size,
+            "timestamp": parse_name_time(name),
+            "int_time": None,
+            "checksum": None,
+        }
+
+    def refresh(self):
+        """Rescan the folder, return the (added, removed, changed) names."""
+        seen = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.lower().endswith(SPECTRUM_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    seen[entry.name] = (stat.st_mtime, stat.st_size)
+
+        added = sorted(name for name in seen if name not in self.entries)
+        removed = sorted(name for name in self.entries if name not in seen)
+        touched = sorted(
+            name
+            for name, (mtime, size) in seen.items()
+            if name in self.entries
+            and (self.entries[name]["mtime"], self.entries[name]["size"])
+            != (mtime, size)
+        )
+        changed = [
+            name for name in touched if self._content_changed(name, *seen[name])
+        ]
+        for name in removed:
+            del self.entries[name]
+            self.cache.pop(name, None)
+        for name in added + changed:
+            self.entries[name] = self._new_entry(name, *seen[name])
+            self.cache.pop(name, None)
+        if added or removed or touched:
+            self._save_index()
+        return added, removed, changed
+
+    def _content_changed(self, name, mtime, size):
+        """False when only the mtime moved (re-copied or touched file).
+
+        The checksum recorded at load time tells a rewrite with the same
+        size apart from an identical file, so those keep their cached
+        spectrum instead of showing up as changed.
+        """
+        entry = self.entries[name]
+        if entry["checksum"] is None or entry["size"] != size:
+            return True
+        try:
+            checksum = file_checksum(os.path.join(self.folder, name))
+        except OSError:
+            return True
+        if checksum != entry["checksum"]:
+            return True
+        entry["mtime"] = mtime
+        return False
+
+    def names(self):
+        return sorted(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def load(self, name):
+        """Parsed and smoothed spectrum, from the cache when possible."""
+        spectrum = self.cache.get(name)
+        if spectrum is not None:
+            self.cache.move_to_end(name)
+            return spectrum
+
+        file_path = os.path.join(self.folder, name)
+        x, y, metadata = load_spectrum(file_path)
+        entry = self.entries.get(name)
+        if entry is None:
+            stat = os.stat(file_path)
+            entry = self.entries[name] = self._new_entry(
+                name, stat.st_mtime, stat.st_size
+            )
+        if entry["checksum"] is None:
+            entry["checksum"] = file_checksum(file_path)
+            entry["int_time"] = metadata.get("int_time")
+            self._save_index()
+
+        spectrum = Spectrum(name, x, y, smooth_spectrum(y, sigma=self.sigma), metadata)
+        self.cache[name] = spectrum
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return spectrum
@@ -0,0 +1,247 @@
+import functools
+import os
+
+from PyQt5.QtCore import QTimer
+
+MPL_STYLE = "seaborn-v0_8-whitegrid"
+MPL_RC = {
+    "figure.figsize": (16, 9),
+    "figure.autolayout": True,
+    "lines.linewidth": 3.0,
+    "lines.markersize": 10.0,
+    "font.size": 14,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def pyplot():
+    """matplotlib.pyplot with the app style, imported by the first MplPanel.
+
+    Importing matplotlib is the largest part of the startup time, so it is
+    deferred until a matplotlib panel is actually built.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.style.use(MPL_STYLE)
+    plt.rcParams.update(MPL_RC)
+    return plt
+
+
+def zoom_limits(xlim, ylim, xdata, ydata, scale_factor):
+    """New (xlim, ylim) after a scroll at (xdata, ydata).
+
+    Scrolling near the bottom edge zooms the x axis, near the left edge the
+    y axis; elsewhere nothing changes (the limit is returned as None).
+    """
+    new_xlim, new_ylim = None, None
+    if (ydata - ylim[0]) / (ylim[1] - ylim[0]) < 0.1:
+        new_xlim = (
+            xdata - (xdata - xlim[0]) * scale_factor,
+            xdata + (xlim[1] - xdata) * scale_factor,
+        )
+    elif (xdata - xlim[0]) / (xlim[1] - xlim[0]) < 0.1:
+        new_ylim = (
+            ydata - (ydata - ylim[0]) * scale_factor,
+            ydata + (ylim[1] - ydata) * scale_factor,
+        )
+    return new_xlim, new_ylim
+
+
+class BlitManager:
+    """Redraw only the changing line artists of a matplotlib canvas.
+
+    The static part of the figure (axes, ticks, labels, grid) is cached on
+    every full draw, which matplotlib triggers itself on resize and after
+    toolbar zoom/pan. Call ``invalidate`` after changing axis limits so the
+    next ``update`` renders the figure once in full. Saved files (toolbar
+    save button or ``savefig``) get the lines drawn like any other artist.
+    """
+
+    def __init__(self, canvas, artists):
+        self.canvas = canvas
+        self.artists = []
+        self.background = None
+        self.printing = False
+        for artist in artists:
+            self.add(artist)
+        self.cid = canvas.mpl_connect("draw_event", self.on_draw)
+        self._print_figure = canvas.print_figure
+        canvas.print_figure = self.print_figure
+
+    def add(self, artist):
+        artist.set_animated(True)
+        self.artists.append(artist)
+
+    def on_draw(self, event):
+        # saving to SVG/PDF draws on a separate canvas without a renderer
+        if self.printing or event.canvas is not self.canvas:
+            return
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.draw_artists()
+
+    def print_figure(self, *args, **kwargs):
+        """canvas.print_figure with the animated lines in the saved file."""
+        self.printing = True
+        for artist in self.artists:
+            artist.set_animated(False)
+        try:
+            return self._print_figure(*args, **kwargs)
+        finally:
+            for artist in self.artists:
+                artist.set_animated(True)
+            self.printing = False
+            # printing may have rendered at another dpi
+            self.invalidate()
+
+    def draw_artists(self):
+        figure = self.canvas.figure
+        for artist in self.artists:
+            figure.draw_artist(artist)
+
+    def invalidate(self):
+        self.background = None
+
+    def update(self):
+        if self.background is None or not self.canvas.supports_blit:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+
+class MplPanel:
+    """One plot tab rendered with matplotlib, blitting its line artists.
+
+    ``update`` is the cheap per-tick refresh, ``draw`` a full redraw.
+    """
+
+    def __init__(self, xlabel, ylabel):
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+        figure, self.ax = pyplot().subplots()
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.canvas = FigureCanvas(figure)
+        self.canvas.mpl_connect("scroll_event", self.on_scroll)
+        self.blit = BlitManager(self.canvas, [])
+        self.widget = self.canvas
+
+    def add_line(self, fmt="-", label=None):
+        (line,) = self.ax.plot([], [], fmt, label=label)
+        self.blit.add(line)
+        return line
+
+    def add_legend(self):
+        self.ax.legend()
+
+    def make_toolbar(self, parent):
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+
+        return NavigationToolbar2QT(self.canvas, parent)
+
+    def autoscale(self):
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.blit.invalidate()
+
+    def get_xlim(self):
+        return self.ax.get_xlim()
+
+    def set_xlim(self, xmin, xmax):
+        self.ax.set_xlim(xmin, xmax)
+        self.blit.invalidate()
+
+    def set_ylim(self, ymin, ymax):
+        self.ax.set_ylim(ymin, ymax)
+        self.blit.invalidate()
+
+    def update(self):
+        self.blit.update()
+
+    def draw(self):
+        self.canvas.draw()
+
+    def on_scroll(self, event):
+        ax = event.inaxes
+        if ax is None:
+            return
+
+        xdata, ydata = event.xdata, event.ydata  # Mouse position in data coords
+        if xdata is None or ydata is None:
+            return  # Ignore scroll events outside the axes
+
+        base_scale = 1.1  # Determines the zoom speed
+        if event.button == "up":
+            # Zoom in
+            scale_factor = 1 / base_scale
+        elif event.button == "down":
+            # Zoom out
+            scale_factor = base_scale
+        else:
+            # Unhandled button
+            return
+
+        xlim, ylim = zoom_limits(
+            ax.get_xlim(), ax.get_ylim(), xdata, ydata, scale_factor
+        )
+        if xlim is not None:
+            ax.set_xlim(xlim)
+        if ylim is not None:
+            ax.set_ylim(ylim)
+        # the cached background still shows the old limits
+        self.blit.invalidate()
+        self.canvas.draw_idle()
+
+
+class DisplayScheduler:
+    """Repaint plots from the latest data at a capped frame rate.
+
+    Data paths only ``mark`` a plot as changed; the timer repaints each
+    marked plot once per frame, so several new samples coalesce into one
+    repaint and nothing is drawn when nothing changed. Plots that are not
+    visible stay marked until they are shown.
+    """
+
+    def __init__(self, fps: float = 20):
+        self.painters = {}
+        self.dirty = set()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.repaint)
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.timer.setInterval(int(1000 / fps))
+
+    def register(self, name, painter, visible=None):
+        self.painters[name] = (painter, visible)
+
+    def mark(self, *names):
+        self.dirty.update(names)
+
+    def repaint(self):
+        for name in list(self.dirty):
+            painter, visible = self.painters[name]
+            if visible is not None and not visible():
+                continue
+            self.dirty.discard(name)
+            painter()
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+
+def make_panel(xlabel, ylabel, backend=None):
+    """Plot panel for the backend named by FIBERX_PLOT (matplotlib or pyqtgraph)."""
+    backend = backend or os.environ.get("FIBERX_PLOT", "matplotlib")
+    if backend == "matplotlib":
+        return MplPanel(xlabel, ylabel)
+    if backend == "pyqtgraph":
+        from plotting_pg import PgPanel
+
+        return PgPanel(xlabel, ylabel)
+    raise ValueError(f"Unknown plot backend: {backend}")
@@ -0,0 +1,91 @@
+import numpy as np
+import pyqtgraph as pg
+
+from plotting import zoom_limits
+
+pg.setConfigOptions(antialias=False, background="w", foreground="k")
+
+# matplotlib's default color cycle, so both backends look alike
+COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b"]
+
+
+class ZoomViewBox(pg.ViewBox):
+    """ViewBox whose mouse wheel zooms like the matplotlib tabs."""
+
+    def wheelEvent(self, ev, axis=None):
+        pos = self.mapToView(ev.pos())
+        scale_factor = 1 / 1.1 if ev.delta() > 0 else 1.1
+        xlim, ylim = self.viewRange()
+        xlim, ylim = zoom_limits(xlim, ylim, pos.x(), pos.y(), scale_factor)
+        if xlim is not None:
+            self.setXRange(*xlim, padding=0)
+        if ylim is not None:
+            self.setYRange(*ylim, padding=0)
+        ev.accept()
+
+
+class PgLine:
+    def __init__(self, item):
+        self.item = item
+
+    def set_data(self, x, y):
+        self.item.setData(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+
+class PgPanel:
+    """One plot tab rendered with pyqtgraph.
+
+    Same interface as plotting.MplPanel. pyqtgraph repaints changed items
+    itself, so ``update`` and ``draw`` have nothing to do. Figures can still
+    be exported through matplotlib from the plot's context menu.
+    """
+
+    def __init__(self, xlabel, ylabel):
+        self.view = ZoomViewBox()
+        self.widget = pg.PlotWidget(viewBox=self.view)
+        self.plot_item = self.widget.getPlotItem()
+        self.plot_item.setLabel("bottom", xlabel)
+        self.plot_item.setLabel("left", ylabel)
+        self.plot_item.showGrid(x=True, y=True, alpha=0.3)
+        self.view.disableAutoRange()
+        self.items = []
+
+    def add_line(self, fmt="-", label=None):
+        color = COLORS[len(self.items) % len(COLORS)]
+        if fmt == ".":
+            item = self.plot_item.plot(
+                [], [], pen=None, symbol="o", symbolSize=8, symbolBrush=color
+            )
+        else:
+            item = self.plot_item.plot([], [], pen=pg.mkPen(color, width=3))
+        item.setClipToView(True)
+        item.setDownsampling(auto=True, method="peak")
+        self.items.append((item, label))
+        return PgLine(item)
+
+    def add_legend(self):
+        legend = self.plot_item.addLegend()
+        for item, label in self.items:
+            if label:
+                legend.addItem(item, label)
+
+    def make_toolbar(self, parent):
+        return None
+
+    def autoscale(self):
+        self.view.autoRange()
+
+    def get_xlim(self):
+        return tuple(self.view.viewRange()[0])
+
+    def set_xlim(self, xmin, xmax):
+        self.view.setXRange(xmin, xmax, padding=0)
+
+    def set_ylim(self, ymin, ymax):
+        self.view.setYRange(ymin, ymax, padding=0)
+
+    def update(self):
+        pass
+
+    def draw(self):
+        pass
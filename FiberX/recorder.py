@@ -0,0 +1,236 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core import FrameMetrics
+
+HEADER_FILE = "header.json"
+WAVELENGTHS_FILE = "wavelengths.f64"
+FRAMES_FILE = "frames.f64"
+INDEX_FILE = "index.bin"
+METRICS_FILE = "metrics.bin"
+REFERENCES_FILE = "references.jsonl"
+
+FRAME_DTYPE = np.dtype("<f8")
+INDEX_DTYPE = np.dtype(
+    [
+        ("seq", "<i8"),
+        ("timestamp", "<f8"),
+        ("int_time", "<f8"),
+        ("dark_id", "<i4"),
+        ("ref_id", "<i4"),
+    ]
+)
+METRICS_DTYPE = np.dtype(
+    [("seq", "<i8"), ("timestamp", "<f8")]
+    + [
+        (name, "<i8" if name == "min_idx" else "<f8")
+        for name in FrameMetrics._fields
+    ]
+)
+
+_STOP = object()
+
+
+def read_header(path):
+    with open(os.path.join(path, HEADER_FILE)) as f:
+        return json.load(f)
+
+
+def _fsync_dir(path):
+    """Make created or renamed directory entries durable (no-op on Windows)."""
+    if os.name == "nt":
+        return  # NTFS journals metadata, directories cannot be opened here
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _truncate(file_path, size):
+    if os.path.exists(file_path) and os.path.getsize(file_path) > size:
+        with open(file_path, "r+b") as f:
+            f.truncate(size)
+
+
+def recover(path):
+    """Cut a session left behind by a crash back to whole records.
+
+    Frames and index records are written in pairs, so both are truncated
+    to the shorter of the two. Returns the number of complete frames.
+    """
+    header = read_header(path)
+    frame_bytes = header["n_length"] * FRAME_DTYPE.itemsize
+
+    frames_path = os.path.join(path, FRAMES_FILE)
+    index_path = os.path.join(path, INDEX_FILE)
+    metrics_path = os.path.join(path, METRICS_FILE)
+    n_frames = min(
+        os.path.getsize(frames_path) // frame_bytes,
+        os.path.getsize(index_path) // INDEX_DTYPE.itemsize,
+    )
+    _truncate(frames_path, n_frames * frame_bytes)
+    _truncate(index_path, n_frames * INDEX_DTYPE.itemsize)
+    if os.path.exists(metrics_path):
+        n_metrics = os.path.getsize(metrics_path) // METRICS_DTYPE.itemsize
+        _truncate(metrics_path, n_metrics * METRICS_DTYPE.itemsize)
+    return n_frames
+
+
+class SessionRecorder:
+    """Append-only recording of every raw frame and its metrics.
+
+    A session is a folder holding the raw frames back to back
+    (``frames.f64``), one index record per frame (sequence number,
+    timestamp, integration time, active dark/ref ids), the per-frame metrics
+    and a JSON header. The ``record_*`` calls only copy into a bounded queue
+    and never block the caller; a writer thread appends to the files and
+    fsyncs them every ``flush_interval`` seconds. Frames that do not fit in
+    the queue are counted in ``dropped``. After a crash, ``recover`` trims
+    the files back to whole records.
+    """
+
+    def __init__(self, path, flush_interval: float = 1.0, max_pending: int = 1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_pending)
+        self.dropped = 0
+        self.error = None
+        self.dark_id = -1
+        self.ref_id = -1
+        self.n_references = 0
+        self.files = []
+        self.thread = None
+        self.closed = False
+
+    def start(self, wavelengths):
+        """Create the session folder and start the writer thread."""
+        os.makedirs(self.path, exist_ok=True)
+        header_path = os.path.join(self.path, HEADER_FILE)
+        if os.path.exists(header_path):
+            raise FileExistsError(f"{self.path} already holds a session")
+
+        wavelengths = np.asarray(wavelengths, dtype=FRAME_DTYPE)
+        self.n_length = len(wavelengths)
+        # without the axis the frames cannot be read back, sync it like the header
+        with open(os.path.join(self.path, WAVELENGTHS_FILE), "wb") as f:
+            f.write(wavelengths.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        header = {
+            "version": 1,
+            "n_length": self.n_length,
+            "started": time.time(),
+            "monotonic_origin": time.monotonic(),
+            "index_fields": list(INDEX_DTYPE.names),
+            "metrics_fields": list(METRICS_DTYPE.names),
+        }
+        with open(header_path + ".tmp", "w") as f:
+            json.dump(header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(header_path + ".tmp", header_path)
+
+        # fsync order matters: a frame is on disk before its index record
+        self.files = [
+            open(os.path.join(self.path, name), "ab")
+            for name in (FRAMES_FILE, INDEX_FILE, METRICS_FILE, REFERENCES_FILE)
+        ]
+        self.frames_file, self.index_file, self.metrics_file, self.refs_file = (
+            self.files
+        )
+        _fsync_dir(self.path)
+        _fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def set_reference(self, kind, name):
+        """Register the dark or ref spectrum used from now on, return its id."""
+        ref_id = self.n_references
+        self.n_references += 1
+        if kind == "dark":
+            self.dark_id = ref_id
+        elif kind == "ref":
+            self.ref_id = ref_id
+        else:
+            raise ValueError(f"Unknown reference kind: {kind}")
+        line = json.dumps({"id": ref_id, "kind": kind, "name": name}) + "\n"
+        self._put(("refs", line.encode("utf-8")))
+        return ref_id
+
+    def record_frame(self, y, timestamp, seq, int_time):
+        record = np.array(
+            (seq, timestamp, int_time, self.dark_id, self.ref_id), dtype=INDEX_DTYPE
+        )
+        self._put(("frame", np.array(y, dtype=FRAME_DTYPE), record))
+
+    def record_metrics(self, metrics, timestamp, seq):
+        record = np.array((seq, timestamp, *metrics), dtype=METRICS_DTYPE)
+        self._put(("metrics", record))
+
+    def _put(self, item):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        next_sync = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if item is not None:
+                    self._write(item)
+                if time.monotonic() >= next_sync:
+                    self._sync()
+                    next_sync = time.monotonic() + self.flush_interval
+            self._sync()
+        except OSError as e:
+            self.error = e
+            self.closed = True
+
+    def _write(self, item):
+        kind = item[0]
+        if kind == "frame":
+            self.frames_file.write(item[1].tobytes())
+            self.index_file.write(item[2].tobytes())
+        elif kind == "metrics":
+            self.metrics_file.write(item[1].tobytes())
+        else:
+            self.refs_file.write(item[1])
+
+    def _sync(self):
+        for f in self.files:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self, timeout: float = None):
+        """Write out everything queued so far and close the files."""
+        if self.closed and self.thread is None:
+            return
+        self.closed = True
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+        self.thread = None
+        for f in self.files:
+            f.close()
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,130 @@
+import os
+import time
+
+import numpy as np
+
+from file_io import SPECTRUM_EXTENSIONS, load_file
+
+
+class CsvFrameSource:
+    """Recorded spectra stored as one CSV (or .npz) file per frame."""
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                paths = [
+                    os.path.join(paths, filename)
+                    for filename in sorted(os.listdir(paths))
+                    if filename.endswith(SPECTRUM_EXTENSIONS)
+                ]
+            else:
+                paths = [paths]
+        if not paths:
+            raise ValueError("No recorded spectra to replay")
+        self.paths = list(paths)
+        self.wavelengths, _ = load_file(self.paths[0])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def timestamp(self, i):
+        return None
+
+    def read(self, i, out):
+        x, y = load_file(self.paths[i])
+        if len(x) == len(self.wavelengths) and np.array_equal(x, self.wavelengths):
+            out[:] = y
+        else:
+            out[:] = np.interp(self.wavelengths, x, y)
+
+
+def open_frame_source(path):
+    """Frame source for a recorded session folder or CSV spectra."""
+    from session import SessionFrameSource, is_session
+
+    if isinstance(path, str) and is_session(path):
+        return SessionFrameSource(path)
+    return CsvFrameSource(path)
+
+
+class ReplayBackend:
+    """Backend that streams recorded spectra instead of reading a device.
+
+    ``speed`` scales the recorded frame timing (or the integration time when
+    the recording has no timestamps); ``speed=None`` replays as fast as
+    possible. Raises EOFError after the last frame unless ``loop`` is set.
+    """
+
+    def __init__(self, source, speed: float = 1.0, loop: bool = False):
+        if not hasattr(source, "read"):
+            source = open_frame_source(source)
+        self.source = source
+        self.speed = speed
+        self.loop = loop
+        self.n_length = len(source.wavelengths)
+        self.microsec = 100 * 1000
+        self.position = 0
+        self.deadline = None
+
+    def open(self):
+        self.position = 0
+        self.deadline = None
+        return 1
+
+    def close(self):
+        pass
+
+    def set_integration_time(self, index, microsec):
+        self.microsec = microsec
+
+    def set_laser_power(self, index, power):
+        pass
+
+    def read_wavelengths(self, index, out):
+        out[:] = self.source.wavelengths
+
+    def frame_interval(self, i):
+        current, previous = self.source.timestamp(i), self.source.timestamp(i - 1)
+        if current is not None and previous is not None:
+            return max(current - previous, 0.0)
+        return self.microsec / 1e6
+
+    def read_spectrum(self, index, out):
+        if self.position >= len(self.source):
+            if not self.loop:
+                raise EOFError("Replay finished")
+            self.position = 0
+        self.source.read(self.position, out)
+
+        if self.speed:
+            now = time.monotonic()
+            if self.deadline is None or self.position == 0:
+                self.deadline = now
+            else:
+                self.deadline += self.frame_interval(self.position) / self.speed
+            if self.deadline > now:
+                time.sleep(self.deadline - now)
+            else:
+                self.deadline = now
+        self.position += 1
+
+
+if __name__ == "__main__":
+    import sys
+
+    from device_io import SignalGenerator
+
+    sg = SignalGenerator(int_time=100, backend=ReplayBackend(sys.argv[1], speed=None))
+    sg.start()
+    y = np.zeros(sg.n_length)
+    n = 0
+    current = time.time()
+    try:
+        while True:
+            sg.read_y(out=y)
+            n += 1
+    except EOFError:
+        pass
+    elapsed = time.time() - current
+    print(f"{n} frames in {elapsed:.3f} s, {n / elapsed:.0f} frames/s")
+    sg.close_spectrometers()
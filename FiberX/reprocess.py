@@ -0,0 +1,172 @@
+import argparse
+import multiprocessing
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from axis import WavelengthAxis
+from core import AnalysisPipeline
+from export import write_parquet
+from file_io import load_file
+from recorder import METRICS_DTYPE
+from session import Session
+from smoothing import smooth_spectrum
+
+
+class ReprocessParams(NamedTuple):
+    dark: str
+    ref: str
+    diff: float = 25
+    range_low: float = 500
+    range_high: float = 700
+    position: float = 700
+    sigma: float = 100
+    fix_minimum: bool = False
+
+
+def build_pipeline(session, params):
+    """AnalysisPipeline set up the way the live app is for these parameters."""
+    pipeline = AnalysisPipeline(WavelengthAxis(session.wavelengths), sigma=params.sigma)
+    pipeline.set_dark(load_file(params.dark)[1])
+    pipeline.set_ref(*load_file(params.ref))
+    pipeline.diff = params.diff
+    pipeline.set_position(params.position)
+    pipeline.set_area_range(params.range_low, params.range_high)
+    if params.fix_minimum and len(session):
+        # the live app pins the minimum of the first analyzed frame
+        try:
+            pipeline.process(session.frames[0])
+        except (ValueError, IndexError):
+            pass  # min_idx_display is set before the centroid can fail
+        pipeline.fix_minimum = True
+    return pipeline
+
+
+def analyze_frames(pipeline, frames, timestamps, seq):
+    """Metric records for a block of raw frames, NaN where analysis fails."""
+    smoothed = smooth_spectrum(frames, sigma=pipeline.sigma)
+    records = np.zeros(len(frames), dtype=METRICS_DTYPE)
+    records["seq"] = seq
+    records["timestamp"] = timestamps
+    for i, y_s in enumerate(smoothed):
+        pipeline.y_s[:] = y_s
+        try:
+            metrics = pipeline.analyze()
+        except (ValueError, IndexError):
+            records[i]["min_idx"] = -1
+            for name in METRICS_DTYPE.names[3:]:
+                records[i][name] = np.nan
+            continue
+        for name, value in zip(metrics._fields, metrics):
+            records[i][name] = value
+    return records
+
+
+_worker = {}
+
+
+def _init_worker(path, params):
+    session = Session(path)
+    _worker["session"] = session
+    _worker["pipeline"] = build_pipeline(session, params)
+
+
+def _process_chunk(bounds):
+    start, stop = bounds
+    session = _worker["session"]
+    return analyze_frames(
+        _worker["pipeline"],
+        session.frames[start:stop],
+        session.index["timestamp"][start:stop],
+        session.index["seq"][start:stop],
+    )
+
+
+def reprocess(path, params, workers: int = None, chunk_size: int = 256):
+    """Recompute the per-frame metrics of a recorded session.
+
+    Every worker process maps the session itself, so only chunk bounds and
+    metric records cross process boundaries; the frames are shared through
+    the OS page cache. Returns records of recorder.METRICS_DTYPE, one per
+    frame in order, with the recorded ``seq`` so rows line up with the
+    live metrics.bin.
+    """
+    n_frames = len(Session(path))
+    chunks = [
+        (start, min(start + chunk_size, n_frames))
+        for start in range(0, n_frames, chunk_size)
+    ]
+    if not chunks:
+        return np.zeros(0, dtype=METRICS_DTYPE)
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _init_worker(path, params)
+        results = [_process_chunk(chunk) for chunk in chunks]
+    else:
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(path, params)
+        ) as pool:
+            results = pool.map(_process_chunk, chunks)
+    return np.concatenate(results)
+
+
+def save_records(records, file_path, metadata: dict = None):
+    """CSV, or Parquet with ``metadata`` in the schema for a .parquet path."""
+    if file_path.lower().endswith(".parquet"):
+        columns = {name: records[name] for name in records.dtype.names}
+        write_parquet(columns, file_path, metadata)
+        return
+
+    import pandas as pd
+
+    pd.DataFrame(records).to_csv(file_path, index=False, lineterminator="\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Recompute centroid, intensity, minimum and area ratio "
+        "of a recorded session."
+    )
+    parser.add_argument("session", help="recorded session folder")
+    parser.add_argument("--dark", required=True, help="dark spectrum file")
+    parser.add_argument("--ref", required=True, help="reference spectrum file")
+    parser.add_argument("--diff", type=float, default=25, help="centroid range (+/-)")
+    parser.add_argument("--range-low", type=float, default=500)
+    parser.add_argument("--range-high", type=float, default=700)
+    parser.add_argument(
+        "--position", type=float, default=700, help="intensity position"
+    )
+    parser.add_argument("--sigma", type=float, default=100, help="spectrum smoothing")
+    parser.add_argument("--fix-minimum", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="CSV or .parquet file, default reprocessed.csv in the session",
+    )
+    args = parser.parse_args(argv)
+
+    params = ReprocessParams(
+        dark=args.dark,
+        ref=args.ref,
+        diff=args.diff,
+        range_low=args.range_low,
+        range_high=args.range_high,
+        position=args.position,
+        sigma=args.sigma,
+        fix_minimum=args.fix_minimum,
+    )
+    current = time.time()
+    records = reprocess(args.session, params, args.workers, args.chunk_size)
+    elapsed = time.time() - current
+    output = args.output or os.path.join(args.session, "reprocessed.csv")
+    save_records(records, output, params._asdict())
+    print(f"{len(records)} frames in {elapsed:.3f} s -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+
+from recorder import (
+    FRAME_DTYPE,
+    FRAMES_FILE,
+    HEADER_FILE,
+    INDEX_DTYPE,
+    INDEX_FILE,
+    METRICS_DTYPE,
+    METRICS_FILE,
+    REFERENCES_FILE,
+    WAVELENGTHS_FILE,
+    read_header,
+    recover,
+)
+
+
+def is_session(path):
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def _memmap(file_path, dtype, n_records, shape=None):
+    """Read-only map of the first n_records records, empty when there are none."""
+    shape = (n_records,) if shape is None else (n_records,) + shape
+    if n_records == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode="r", shape=shape)
+
+
+class Session:
+    """A recorded session opened without loading it into memory.
+
+    ``frames`` is a read-only (frames x n_length) memory map, ``index`` and
+    ``metrics`` are memory-mapped record arrays, so slicing only touches the
+    pages that are read. Trailing partial records of a session that is
+    still being written (or crashed) are ignored; pass ``repair=True`` to
+    trim them from disk first.
+    """
+
+    def __init__(self, path, repair: bool = False):
+        self.path = path
+        if repair:
+            recover(path)
+        self.header = read_header(path)
+        self.n_length = self.header["n_length"]
+        self.wavelengths = np.fromfile(
+            os.path.join(path, WAVELENGTHS_FILE), dtype=FRAME_DTYPE
+        )
+
+        frames_path = os.path.join(path, FRAMES_FILE)
+        index_path = os.path.join(path, INDEX_FILE)
+        metrics_path = os.path.join(path, METRICS_FILE)
+        frame_bytes = self.n_length * FRAME_DTYPE.itemsize
+        n_frames = min(
+            os.path.getsize(frames_path) // frame_bytes,
+            os.path.getsize(index_path) // INDEX_DTYPE.itemsize,
+        )
+        n_metrics = (
+            os.path.getsize(metrics_path) // METRICS_DTYPE.itemsize
+            if os.path.exists(metrics_path)
+            else 0
+        )
+        self.frames = _memmap(
+            frames_path, FRAME_DTYPE, n_frames, shape=(self.n_length,)
+        )
+        self.index = _memmap(index_path, INDEX_DTYPE, n_frames)
+        self.metrics = _memmap(metrics_path, METRICS_DTYPE, n_metrics)
+        self.references = self._read_references()
+
+    def _read_references(self):
+        references = {}
+        refs_path = os.path.join(self.path, REFERENCES_FILE)
+        if not os.path.exists(refs_path):
+            return references
+        with open(refs_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # partial last line
+                references[entry["id"]] = entry
+        return references
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def timestamps(self):
+        return self.index["timestamp"]
+
+    def metric(self, name):
+        """One metric column (e.g. ``centroid_x``) as a memory-mapped view."""
+        return self.metrics[name]
+
+    def reference_name(self, ref_id):
+        entry = self.references.get(int(ref_id))
+        return None if entry is None else entry["name"]
+
+
+class SessionFrameSource:
+    """Frame source over a recorded session for replay.ReplayBackend."""
+
+    def __init__(self, session):
+        if not isinstance(session, Session):
+            session = Session(session)
+        self.session = session
+        self.wavelengths = session.wavelengths
+
+    def __len__(self):
+        return len(self.session)
+
+    def timestamp(self, i):
+        if not 0 <= i < len(self.session):
+            return None
+        return float(self.session.index["timestamp"][i])
+
+    def read(self, i, out):
+        out[:] = self.session.frames[i]
@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+
+# cubic pixel -> wavelength calibration of the 4096 pixel device in data/
+WAVELENGTH_COEFFS = (-2.62205e-10, -2.53994e-06, 1.90469e-01, 3.86922e02)
+
+
+def make_wavelengths(n_length: int = 4096):
+    return np.polyval(WAVELENGTH_COEFFS, np.arange(n_length))
+
+
+class SimulatedBackend:
+    """Deterministic stand-in for the spectrometer.
+
+    Produces a broadband source with an absorption dip that drifts over
+    time, shot and read noise, and counts that scale with the integration
+    time. With ``realtime`` the reads are paced like the hardware (one frame
+    per integration time or per ``1 / frame_rate`` seconds); without it
+    frames are returned as fast as they can be computed.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        dark_level: float = 650.0,
+        counts_per_ms: float = 300.0,
+        source_center: float = 720.0,
+        source_width: float = 130.0,
+        dip_center: float = 700.0,
+        dip_width: float = 15.0,
+        dip_depth: float = 0.4,
+        dip_drift: float = 0.01,
+        read_noise: float = 5.0,
+        frame_rate: float = None,
+        realtime: bool = True,
+    ):
+        self.seed = seed
+        self.dark_level = dark_level
+        self.counts_per_ms = counts_per_ms
+        self.source_center = source_center
+        self.source_width = source_width
+        self.dip_center = dip_center
+        self.dip_width = dip_width
+        self.dip_depth = dip_depth
+        self.dip_drift = dip_drift
+        self.read_noise = read_noise
+        self.frame_rate = frame_rate
+        self.realtime = realtime
+        self.microsec = 100 * 1000
+        self.rng = np.random.default_rng(seed)
+        self.n_frames = 0
+        self.deadline = None
+        self.x = None
+        self.source = None
+
+    def open(self):
+        self.rng = np.random.default_rng(self.seed)
+        self.n_frames = 0
+        self.deadline = None
+        return 1
+
+    def close(self):
+        pass
+
+    def set_integration_time(self, index, microsec):
+        self.microsec = microsec
+
+    def set_laser_power(self, index, power):
+        pass
+
+    def read_wavelengths(self, index, out):
+        out[:] = make_wavelengths(len(out))
+
+    @property
+    def frame_interval(self):
+        if self.frame_rate:
+            return 1.0 / self.frame_rate
+        return self.microsec / 1e6
+
+    def read_spectrum(self, index, out):
+        if self.x is None or len(self.x) != len(out):
+            self.x = make_wavelengths(len(out))
+            self.source = np.exp(
+                -0.5 * ((self.x - self.source_center) / self.source_width) ** 2
+            )
+
+        # simulated time, independent of how fast frames are pulled
+        t = self.n_frames * self.frame_interval
+        center = self.dip_center + self.dip_drift * t
+        transmission = 1 - self.dip_depth * np.exp(
+            -0.5 * ((self.x - center) / self.dip_width) ** 2
+        )
+        signal = self.counts_per_ms * self.microsec / 1000 * self.source * transmission
+        noise = np.sqrt(signal) + self.read_noise
+        np.multiply(self.rng.standard_normal(len(out)), noise, out=out)
+        out += signal + self.dark_level
+        np.clip(out, 0, 65535, out=out)
+        np.rint(out, out=out)
+        self.n_frames += 1
+
+        if self.realtime:
+            now = time.monotonic()
+            if self.deadline is None:
+                self.deadline = now
+            self.deadline += self.frame_interval
+            if self.deadline > now:
+                time.sleep(self.deadline - now)
+            else:
+                self.deadline = now
+
+
+if __name__ == "__main__":
+    from device_io import SignalGenerator
+
+    sg = SignalGenerator(int_time=100, backend=SimulatedBackend(realtime=False))
+    sg.start()
+    x = sg.generate_x()
+    y = np.zeros(sg.n_length)
+    n = 1000
+    current = time.time()
+    for _ in range(n):
+        sg.read_y(out=y)
+    elapsed = time.time() - current
+    print(x[:5], y[:5], f"{n / elapsed:.0f} frames/s")
+    sg.close_spectrometers()
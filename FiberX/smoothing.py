@@ -0,0 +1,140 @@
+import functools
+
+import numpy as np
+
+from timeseries import GrowableArray, grow
+
+
+def gaussian_kernel(sigma: float, truncate: float = 4.0):
+    """Normalized Gaussian weights, same taps as scipy's gaussian_filter1d."""
+    radius = int(truncate * sigma + 0.5)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+class IncrementalGaussian:
+    """Gaussian smoothing of a growing series at constant cost per sample.
+
+    A new sample only changes the last ``radius + 1`` smoothed values (the
+    ones whose window reaches the reflected right edge), so only those are
+    recomputed. The result always equals
+    ``gaussian_filter1d(series, sigma, mode="reflect")`` over the full
+    history, which makes it usable as is at save time.
+
+    With ``source`` (a timeseries.GrowableArray, e.g. a TimeSeriesStore
+    column) the raw samples are read from it instead of being copied;
+    call ``update`` after appending there.
+    """
+
+    def __init__(
+        self,
+        sigma: float = 10,
+        truncate: float = 4.0,
+        capacity: int = 1024,
+        source: GrowableArray = None,
+    ):
+        self.kernel = gaussian_kernel(sigma, truncate)
+        self.radius = len(self.kernel) // 2
+        self.source = source if source is not None else GrowableArray(capacity)
+        self.smoothed = np.zeros(capacity)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def raw(self):
+        return self.source.values
+
+    @property
+    def values(self):
+        return self.smoothed[: self.count]
+
+    def append(self, value):
+        self.source.append(value)
+        self.update()
+
+    def update(self):
+        """Smooth the samples appended to the source since the last call."""
+        n, r = len(self.source), self.radius
+        if n < self.count:
+            self.count = 0  # source was cleared
+        if n == self.count:
+            return
+        self.smoothed = grow(self.smoothed, n)
+        first = max(0, self.count - r)
+        self.count = n
+        seg_start = max(0, first - r)
+        segment = self.source.data[seg_start:n]
+        left = r if seg_start == 0 else 0
+        padded = np.pad(segment, (left, r), mode="symmetric")
+        out = np.correlate(padded, self.kernel, mode="valid")
+        self.smoothed[first:n] = out[first - seg_start - r + left :]
+
+    def clear(self):
+        self.count = 0
+
+
+def next_fast_len(n: int):
+    """Smallest length >= n whose only prime factors are 2, 3 and 5."""
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+class SpectrumSmoother:
+    """Gaussian smoothing of fixed-length spectra with a precomputed kernel.
+
+    The kernel spectrum is computed once per (sigma, frame length); each
+    frame then costs one reflect-pad into a preallocated buffer and a real
+    FFT round trip, matching ``gaussian_filter1d(y, sigma)`` to rounding.
+    Frames are accepted as 1-D arrays or 2-D stacks along the last axis.
+    """
+
+    def __init__(self, sigma: float, n_length: int, truncate: float = 4.0):
+        kernel = gaussian_kernel(sigma, truncate)
+        self.sigma = sigma
+        self.n_length = n_length
+        self.radius = len(kernel) // 2
+        self.n_fft = next_fast_len(n_length + 2 * self.radius)
+        self.kernel_fft = np.fft.rfft(kernel, self.n_fft)
+        self.padded = np.zeros(self.n_fft)
+
+    def _pad(self, y):
+        r, n = self.radius, self.n_length
+        if y.ndim > 1 or r >= n:
+            width = [(0, 0)] * (y.ndim - 1) + [(r, r)]
+            return np.pad(y, width, mode="symmetric")
+        self.padded[r : r + n] = y
+        self.padded[:r] = y[r - 1 :: -1]
+        self.padded[r + n : n + 2 * r] = y[: n - r - 1 : -1]
+        return self.padded
+
+    def __call__(self, y, out=None):
+        y = np.asarray(y, dtype=np.float64)
+        if y.shape[-1] != self.n_length:
+            raise ValueError(f"Expected frames of length {self.n_length}")
+        spectrum = np.fft.rfft(self._pad(y), self.n_fft, axis=-1)
+        spectrum *= self.kernel_fft
+        full = np.fft.irfft(spectrum, self.n_fft, axis=-1)
+        start = 2 * self.radius
+        if out is None:
+            return full[..., start : start + self.n_length].copy()
+        out[...] = full[..., start : start + self.n_length]
+        return out
+
+
+@functools.lru_cache(maxsize=16)
+def get_spectrum_smoother(sigma: float, n_length: int):
+    return SpectrumSmoother(sigma, n_length)
+
+
+def smooth_spectrum(y, sigma: float = 100, out=None):
+    """Smooth one spectrum (or a stack of them) with a shared cached smoother."""
+    return get_spectrum_smoother(sigma, np.shape(y)[-1])(y, out=out)
@@ -0,0 +1,89 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+FIBERX_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(FIBERX_DIR), "app-qt.py")
+
+# loads the GUI module without running its __main__ block
+_CHILD = """
+import runpy, sys, time
+sys.path.insert(0, {fiberx!r})
+start = time.perf_counter()
+namespace = runpy.run_path({app!r}, run_name="fiberx_startup")
+loaded = time.perf_counter()
+shown = loaded
+if {window!r}:
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    window = namespace["App"]()
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+print(loaded - start, shown - loaded)
+"""
+
+
+def parse_importtime(stderr):
+    """Self import time in seconds per top-level package from -X importtime."""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].strip().split(".")[0]
+        packages[name] += int(fields[0]) / 1e6
+    return packages
+
+
+def measure(app_path=APP_PATH, window=False):
+    """(module load s, window s, import s per package) in a fresh interpreter."""
+    code = _CHILD.format(fiberx=FIBERX_DIR, app=app_path, window=window)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded, shown = map(float, result.stdout.split()[-2:])
+    return loaded, shown, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Startup time of the Qt app and import cost per package."
+    )
+    parser.add_argument("--app", default=APP_PATH, help="GUI script to load")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters")
+    parser.add_argument(
+        "--window", action="store_true", help="also build and show the main window"
+    )
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.app, args.window) for _ in range(args.repeat)]
+    loaded = statistics.median(run[0] for run in runs)
+    shown = statistics.median(run[1] for run in runs)
+    names = set().union(*(run[2] for run in runs))
+    packages = {
+        name: statistics.median(run[2].get(name, 0.0) for run in runs)
+        for name in names
+    }
+
+    print(f"module load {loaded * 1000:.0f} ms (median of {args.repeat})")
+    if args.window:
+        print(f"window      {shown * 1000:.0f} ms")
+    print(f"{'package':<24}{'import ms':>10}")
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"{name:<24}{seconds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import multiprocessing
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from axis import WavelengthAxis
+from core import AnalysisPipeline
+from file_io import load_file
+from session import Session
+from smoothing import smooth_spectrum
+
+
+def parse_range(text):
+    low, high = text.split("-")
+    return float(low), float(high)
+
+
+def series_stats(t, values):
+    """Mean, frame-to-frame noise and linear drift (per hour) of a series.
+
+    Noise is the standard deviation of successive differences over sqrt(2),
+    which a slow drift does not inflate. Frames where the analysis failed
+    (NaN) are left out.
+    """
+    valid = np.isfinite(values)
+    t, values = t[valid], values[valid]
+    stats = {"valid": valid.mean() if len(valid) else 0.0}
+    if len(values) < 3:
+        return {**stats, "mean": np.nan, "noise": np.nan, "drift_per_h": np.nan}
+    slope = np.polyfit(t - t[0], values, 1)[0]
+    return {
+        **stats,
+        "mean": values.mean(),
+        "noise": np.diff(values).std() / np.sqrt(2),
+        "drift_per_h": slope * 3600,
+    }
+
+
+class SweepGrid(NamedTuple):
+    """Parameter values to evaluate; each metric depends on one of them only."""
+
+    diffs: list
+    positions: list
+    ranges: list
+
+
+def build_sweep_pipeline(session, dark, ref, sigma):
+    pipeline = AnalysisPipeline(WavelengthAxis(session.wavelengths), sigma=sigma)
+    pipeline.set_dark(load_file(dark)[1])
+    pipeline.set_ref(*load_file(ref))
+    return pipeline
+
+
+def sweep_frames(pipeline, grid, frames):
+    """All swept series for a block of raw frames.
+
+    Smoothing and absorbance are computed once for the whole block; the
+    centroid then only needs its window per ``diff``, the intensity one
+    column per position and the area ratio one dot product per range.
+    """
+    axis = pipeline.axis
+    n = pipeline.n_absorb
+    y_s = smooth_spectrum(frames, sigma=pipeline.sigma)
+    absorb = np.abs((y_s[:, :n] - pipeline.y_darks[:n]) / pipeline.denominator[:n])
+    absorb *= 100
+    min_idx = np.argmin(absorb, axis=1)
+
+    result = {"min_wavelength": pipeline.x_ab[min_idx]}
+    for diff in grid.diffs:
+        centroids = np.full(len(frames), np.nan)
+        for i, row in enumerate(absorb):
+            pipeline.y_abs[:] = row
+            try:
+                centroids[i] = pipeline.find_centroid(min_idx[i], diff)[0]
+            except (ValueError, IndexError):
+                pass
+        result[("centroid", diff)] = centroids
+
+    positions = axis.indices(np.asarray(grid.positions, dtype=float))
+    for position, idx in zip(grid.positions, positions):
+        valid = 0 <= idx < n
+        result[("intensity", position)] = (
+            absorb[:, idx] if valid else np.full(len(frames), np.nan)
+        )
+
+    x = pipeline.x
+    for low, high in grid.ranges:
+        try:
+            pipeline.set_area_range(low, high)
+        except ValueError:
+            result[("area_ratio", (low, high))] = np.full(len(frames), np.nan)
+            continue
+        area = pipeline.area_range
+        result[("area_ratio", (low, high))] = (
+            y_s[:, area] @ x[area] / pipeline.area_ref * 100
+        )
+    return result
+
+
+_worker = {}
+
+
+def _init_worker(path, dark, ref, sigma, grid):
+    session = Session(path)
+    _worker["session"] = session
+    _worker["pipeline"] = build_sweep_pipeline(session, dark, ref, sigma)
+    _worker["grid"] = grid
+
+
+def _sweep_chunk(bounds):
+    start, stop = bounds
+    return sweep_frames(
+        _worker["pipeline"], _worker["grid"], _worker["session"].frames[start:stop]
+    )
+
+
+def sweep(path, dark, ref, grid, sigma=100, workers=None, chunk_size=256):
+    """Evaluate every grid value over a recorded session.
+
+    Returns (timestamps, series) where series maps ``(metric, parameter)``
+    to one value per frame, plus ``min_wavelength`` which no swept
+    parameter affects.
+    """
+    session = Session(path)
+    n_frames = len(session)
+    chunks = [
+        (start, min(start + chunk_size, n_frames))
+        for start in range(0, n_frames, chunk_size)
+    ]
+    initargs = (path, dark, ref, sigma, grid)
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(chunks) < 2:
+        _init_worker(*initargs)
+        results = [_sweep_chunk(chunk) for chunk in chunks]
+    else:
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=initargs
+        ) as pool:
+            results = pool.map(_sweep_chunk, chunks)
+
+    keys = results[0].keys() if results else []
+    series = {key: np.concatenate([r[key] for r in results]) for key in keys}
+    return np.array(session.timestamps), series
+
+
+def sweep_table(timestamps, series):
+    rows = []
+    for key, values in series.items():
+        metric, parameter = (key, None) if isinstance(key, str) else key
+        if isinstance(parameter, tuple):
+            parameter = f"{parameter[0]:g}-{parameter[1]:g}"
+        stats = series_stats(timestamps, values)
+        rows.append({"metric": metric, "parameter": parameter, **stats})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Noise and drift of the centroid, intensity and area ratio "
+        "of a recorded session over a grid of analysis parameters."
+    )
+    parser.add_argument("session", help="recorded session folder")
+    parser.add_argument("--dark", required=True, help="dark spectrum file")
+    parser.add_argument("--ref", required=True, help="reference spectrum file")
+    parser.add_argument("--diffs", type=float, nargs="+", default=[15, 20, 25, 30])
+    parser.add_argument("--positions", type=float, nargs="+", default=[700])
+    parser.add_argument(
+        "--ranges", type=parse_range, nargs="+", default=[(500, 700)], help="low-high"
+    )
+    parser.add_argument("--sigma", type=float, default=100, help="spectrum smoothing")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument(
+        "-o", "--output", help="CSV file, default sweep.csv in the session"
+    )
+    args = parser.parse_args(argv)
+
+    grid = SweepGrid(args.diffs, args.positions, args.ranges)
+    timestamps, series = sweep(
+        args.session,
+        args.dark,
+        args.ref,
+        grid,
+        sigma=args.sigma,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    rows = sweep_table(timestamps, series)
+
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    output = args.output or os.path.join(args.session, "sweep.csv")
+    df.to_csv(output, index=False, lineterminator="\n")
+    print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+def grow(arr, size):
+    """arr if it already holds size items, else a copy with doubled capacity."""
+    if size <= len(arr):
+        return arr
+    new = np.empty(max(size, 2 * len(arr)), dtype=arr.dtype)
+    new[: len(arr)] = arr
+    return new
+
+
+class GrowableArray:
+    """Append-only 1-D buffer with amortized-doubling capacity.
+
+    ``values`` is a view of the filled part; it stays valid until an append
+    has to grow the buffer, so take a fresh one after appending.
+    """
+
+    def __init__(self, capacity: int = 1024, dtype=np.float64):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def values(self):
+        return self.data[: self.count]
+
+    def append(self, value):
+        self.data = grow(self.data, self.count + 1)
+        self.data[self.count] = value
+        self.count += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        n = self.count + len(values)
+        self.data = grow(self.data, n)
+        self.data[self.count : n] = values
+        self.count = n
+
+    def clear(self):
+        self.count = 0
+
+
+class TimeSeriesStore:
+    """Per-sample metric columns sharing one timestamp column.
+
+    Each ``append`` adds one row. ``store[name]``, ``timestamps`` and
+    ``index`` (the sample numbers) are zero-copy views for plotting,
+    smoothing and export.
+    """
+
+    def __init__(self, columns, capacity: int = 1024):
+        self.time = GrowableArray(capacity)
+        self.columns = {name: GrowableArray(capacity) for name in columns}
+        self._index = np.arange(capacity)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, name):
+        return self.columns[name].values
+
+    @property
+    def timestamps(self):
+        return self.time.values
+
+    @property
+    def index(self):
+        n = len(self)
+        if n > len(self._index):
+            self._index = np.arange(max(n, 2 * len(self._index)))
+        return self._index[:n]
+
+    def append(self, timestamp, **values):
+        if values.keys() != self.columns.keys():
+            raise KeyError(f"Expected values for {list(self.columns)}")
+        self.time.append(timestamp)
+        for name, column in self.columns.items():
+            column.append(values[name])
+
+    def clear(self):
+        self.time.clear()
+        for column in self.columns.values():
+            column.clear()
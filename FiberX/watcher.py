@@ -0,0 +1,50 @@
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+
+class FolderWatcher(QObject):
+    """Keep a SpectrumLibrary in sync with its folder.
+
+    Uses the native change notifications behind QFileSystemWatcher (inotify,
+    ReadDirectoryChangesW, kqueue) and polls instead where they are not
+    available, e.g. on UNC network paths. Bursts of events are coalesced
+    into one library refresh; ``changed`` carries its (added, removed,
+    changed) file names and is only emitted when something changed.
+    """
+
+    changed = pyqtSignal(list, list, list)
+
+    def __init__(self, parent=None, delay_ms: int = 200, poll_ms: int = 2000):
+        super().__init__(parent)
+        self.library = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule)
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(delay_ms)
+        self.debounce.timeout.connect(self.refresh)
+        self.poll = QTimer(self)
+        self.poll.setInterval(poll_ms)
+        self.poll.timeout.connect(self.refresh)
+
+    def watch(self, library):
+        directories = self.watcher.directories()
+        if directories:
+            self.watcher.removePaths(directories)
+        self.poll.stop()
+        self.library = library
+        network = library.folder.startswith(("\\\\", "//"))
+        if network or not self.watcher.addPath(library.folder):
+            self.poll.start()
+
+    def schedule(self, path=None):
+        self.debounce.start()
+
+    def refresh(self):
+        if self.library is None:
+            return
+        try:
+            added, removed, changed = self.library.refresh()
+        except OSError:
+            return  # folder gone or network drive unreachable for now
+        if added or removed or changed:
+            self.changed.emit(added, removed, changed)
@@ -1,5 +1,5 @@
 import sys
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 from PyQt5.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -19,46 +19,40 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QButtonGroup,
     QRadioButton,
+    QMessageBox,
 )
 from PyQt5.QtGui import QFont
-from matplotlib.backends.backend_qt5agg import (
-    FigureCanvasQTAgg as FigureCanvas,
-    NavigationToolbar2QT as NavigationToolbar,
-)
-import matplotlib.pyplot as plt
 import qdarktheme
 
 
 import os
 import ctypes
-import pandas as pd
-import openpyxl
 import numpy as np
-from shapely.geometry import Polygon
-from scipy.ndimage import gaussian_filter1d
 
-from device_io import SignalGenerator, resource_path
+from device_io import backend_from_env, resource_path
+from acquisition import AcquisitionWorker
+from core import AnalysisPipeline
+from decimate import MinMaxPyramid
+from export import EXCEL_MAX_ROWS, ExportJob, ExportParameters, build_export
+from library import SpectrumLibrary
+from plotting import DisplayScheduler, make_panel
+from recorder import SessionRecorder
+from smoothing import IncrementalGaussian
+from timeseries import TimeSeriesStore
+from watcher import FolderWatcher
 from file_io import (
-    load_file,
     make_dark_file,
     make_ref_file,
     save_file,
     make_results_file,
+    make_session_folder,
 )
 
-ctypes.windll.shcore.SetProcessDpiAwareness(2)
-ctypes.windll.kernel32.SetDllDirectoryW(None)
-
-plt.style.use("seaborn-v0_8-whitegrid")
-plt.rcParams.update(
-    {
-        "figure.figsize": (16, 9),
-        "figure.autolayout": True,
-        "lines.linewidth": 3.0,
-        "lines.markersize": 10.0,
-        "font.size": 14,
-    }
-)
+SPECTRUM_FILTER = "Spectrum (*.npz);;CSV(*.csv)"
+
+if sys.platform == "win32":
+    ctypes.windll.shcore.SetProcessDpiAwareness(2)
+    ctypes.windll.kernel32.SetDllDirectoryW(None)
 
 import time
 from functools import wraps
@@ -77,6 +71,8 @@ def timeit(func):
 
 
 class App(QMainWindow):
+    export_done = pyqtSignal(str, object)
+
     def __init__(self):
         super().__init__()
         self.init_ui()
@@ -89,17 +85,31 @@ class App(QMainWindow):
         self.range_high = 700
         self.ini_position = 700
         self.scale_factor_x = 50
+        self.display_fps = float(os.environ.get("FIBERX_FPS", 20))
+        self.record_folder = os.environ.get("FIBERX_RECORD")
+        self.recorder = None
+        self.recorder_dropped = 0
         self.position = None
         self.min_idx = None
         self.min_idx_display = None
         self.fix_minimum = False
         self.centroid_x, self.centroid_y = None, None
-        self.intensities = []
+        self.series = TimeSeriesStore(["centroid", "intensity", "min", "area_ratio"])
         self.intensities_sm = []
-        self.mins = []
-        self.centroids = []
         self.centroids_sm = []
-        self.area_ratios = []
+        # smoothing and decimation read the store's columns, nothing is copied
+        columns = self.series.columns
+        self.centroid_smoother = IncrementalGaussian(
+            sigma=10, source=columns["centroid"]
+        )
+        self.intensity_smoother = IncrementalGaussian(
+            sigma=10, source=columns["intensity"]
+        )
+        self.pipeline = AnalysisPipeline(sigma=100)
+        self.centroids_lod = MinMaxPyramid(source=columns["centroid"])
+        self.intensities_lod = MinMaxPyramid(source=columns["intensity"])
+        self.mins_lod = MinMaxPyramid(source=columns["min"])
+        self.area_ratios_lod = MinMaxPyramid(source=columns["area_ratio"])
 
         self.inited_absorb = False
         self.inited_plots = False
@@ -117,6 +127,14 @@ class App(QMainWindow):
         self.y_abs = []
 
         self.dark_file, self.ref_file = None, None
+        self.dark_library, self.ref_library = None, None
+        self.dark_buttons, self.ref_buttons = {}, {}
+        self.export_job = None
+        self.export_done.connect(self.on_export_done)
+        self.dark_watcher = FolderWatcher(self)
+        self.dark_watcher.changed.connect(self.on_dark_folder_changed)
+        self.ref_watcher = FolderWatcher(self)
+        self.ref_watcher.changed.connect(self.on_ref_folder_changed)
 
         if os.path.exists("data"):
             self.folder_path = "data"
@@ -137,6 +155,7 @@ class App(QMainWindow):
         self.build_control_block()
         self.build_display_block()
         self.build_plot_block()
+        self.build_display_scheduler()
 
     def init_ui(self):
         self.setWindowTitle("App")
@@ -339,71 +358,189 @@ class App(QMainWindow):
         self.build_tab5()
         self.build_tab6()
 
+    def build_display_scheduler(self):
+        # acquisition and analysis only mark plots; repaints run at display_fps
+        self.display = DisplayScheduler(self.display_fps)
+        painters = [
+            self.paint_spectrum,
+            self.update_plot2,
+            self.update_plot3,
+            self.update_plot4,
+            self.update_plot5,
+            self.update_plot6,
+        ]
+        for tab, painter in enumerate(painters):
+            self.display.register(
+                f"plot{tab + 1}",
+                painter,
+                visible=lambda tab=tab: self.notebook.currentIndex() == tab,
+            )
+        self.display.timer.timeout.connect(self.check_recorder)
+        self.display.start()
+
     def start_real(self):
         self.stop_button.setEnabled(True)
 
         self.int_timer = QTimer()
         self.int_time = int(self.int_entry.text())
 
-        if self.inited_absorb == False:
-            self.init_real()
+        if self.inited_absorb == False and not self.init_real():
+            return
 
         self.int_timer.timeout.connect(self.update_real)
         self.int_timer.start(self.int_time)
 
     def init_real(self):
-        self.signal_generator = SignalGenerator(int_time=self.int_time)
-        self.signal_generator.start()
-        self.x = self.signal_generator.generate_x()
-        self.y = self.signal_generator.generate_y()
-        self.y_s = gaussian_filter1d(self.y, sigma=100)
+        if self.record_folder:
+            self.recorder = SessionRecorder(
+                os.path.join(self.record_folder, make_session_folder())
+            )
+            self.recorder_dropped = 0
+            if self.dark_file:
+                self.recorder.set_reference("dark", self.dark_file)
+            if self.ref_file:
+                self.recorder.set_reference("ref", self.ref_file)
+        acquisition = None
+        try:
+            acquisition = AcquisitionWorker(
+                int_time=self.int_time,
+                backend=backend_from_env(),
+                recorder=self.recorder,
+            )
+            acquisition.start()
+            self.x = acquisition.wait_ready()
+            frame = acquisition.latest()
+            if frame is None:
+                raise EOFError("没有读到光谱")
+        except Exception as e:
+            # missing DLL, no device, bad replay source, recorder start error
+            if acquisition is not None:
+                acquisition.stop()
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            self.inited_absorb = False
+            self.stop_button.setEnabled(False)
+            self.show_acquisition_error(e)
+            return False
+        self.acquisition = acquisition
+        self.axis = self.acquisition.axis
+        self.y, self.last_ts, self.last_seq = frame
+        self.pipeline.set_axis(self.axis)
+        self.y_s = self.pipeline.smooth(self.y)
         self.plot1_real.set_data(self.x, self.y_s)
-        self.ax1.relim()
-        self.ax1.autoscale_view()
+        self.panel1.autoscale()
         self.inited_absorb = True
         self.init_ratio()
+        return True
 
     def update_real(self):
-        self.x = self.signal_generator.generate_x()
-        self.y = self.signal_generator.generate_y()
-        self.y_s = gaussian_filter1d(self.y, sigma=100)
-        self.plot1_real.set_data(self.x, self.y_s)
-        self.canvas1.mpl_connect("scroll_event", self.on_scroll)
-        self.canvas1.draw()
+        frame = self.acquisition.latest()
+        if frame is None or frame[2] == self.last_seq:
+            self.check_acquisition()
+            return
+        self.y, self.last_ts, self.last_seq = frame
+        self.pipeline.smooth(self.y)
+        self.display.mark("plot1")
         self.update_ratio()
 
+    def paint_spectrum(self):
+        self.plot1_real.set_data(self.x, self.y_s)
+        self.panel1.update()
+
     def select_dark_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "选择暗光谱文件夹")
         if folder:
             self.dark_folder = folder
             self.build_dark_block()
 
+    def spectrum_metadata(self, kind):
+        return {
+            "kind": kind,
+            "device": type(self.acquisition.backend).__name__,
+            "int_time": self.int_time,
+            "timestamp": time.time(),
+            "smoothing": None,
+        }
+
     def save_dark(self):
-        ininame = make_dark_file()
+        ininame = make_dark_file(".npz")
         full_path = os.path.join(self.dark_folder, ininame)
         dark_path, _ = QFileDialog.getSaveFileName(
             self,
             "Save As",
             full_path,
-            'CSV(*.csv)'
+            SPECTRUM_FILTER
         )
         if dark_path:
-            save_file(self.x, self.y, dark_path)
-            self.build_dark_block()
+            save_file(self.x, self.y, dark_path, self.spectrum_metadata("dark"))
+            self.dark_watcher.refresh()
 
     def update_dark_files(self):
         if self.dark_folder:
-            self.radio_buttons_group = QButtonGroup(self.scrollable_frame)
-            filenames = os.listdir(self.dark_folder)
-            for filename in filenames:
+            self.dark_library = self.open_library(self.dark_library, self.dark_folder)
+            self.dark_group = QButtonGroup(self.scrollable_frame)
+            self.dark_buttons = {}
+            self.update_file_buttons(
+                self.dark_buttons,
+                self.scrollable_layout,
+                self.dark_group,
+                self.dark_library.names(),
+                self.load_dark,
+            )
+            self.dark_watcher.watch(self.dark_library)
+        else:
+            label = QLabel("请选择暗光谱文件夹。")
+
+    def update_file_buttons(self, buttons, layout, group, names, load, removed=()):
+        # only touch the widgets of files that appeared or disappeared
+        for filename in removed:
+            radio_button = buttons.pop(filename, None)
+            if radio_button is not None:
+                group.removeButton(radio_button)
+                layout.removeWidget(radio_button)
+                radio_button.deleteLater()
+        for position, filename in enumerate(names):
+            if filename not in buttons:
                 radio_button = QRadioButton(filename)
                 radio_button.toggled.connect(
-                    lambda checked, file=filename: self.load_dark(checked, file)
+                    lambda checked, file=filename: load(checked, file)
                 )
-                self.scrollable_layout.addWidget(radio_button)
-                self.radio_buttons_group.addButton(radio_button)
-        else:
-            label = QLabel("请选择暗光谱文件夹。")
+                layout.insertWidget(position, radio_button)
+                group.addButton(radio_button)
+                buttons[filename] = radio_button
+
+    def on_dark_folder_changed(self, added, removed, changed):
+        self.update_file_buttons(
+            self.dark_buttons,
+            self.scrollable_layout,
+            self.dark_group,
+            self.dark_library.names(),
+            self.load_dark,
+            removed,
+        )
+        changed_paths = {os.path.join(self.dark_folder, name) for name in changed}
+        if self.dark_file in changed_paths:
+            self.load_dark(True, os.path.basename(self.dark_file))
+
+    def on_ref_folder_changed(self, added, removed, changed):
+        self.update_file_buttons(
+            self.ref_buttons,
+            self.scrollable_layout_2,
+            self.ref_group,
+            self.ref_library.names(),
+            self.load_ref,
+            removed,
+        )
+        changed_paths = {os.path.join(self.ref_folder, name) for name in changed}
+        if self.ref_file in changed_paths:
+            self.load_ref(True, os.path.basename(self.ref_file))
+
+    def open_library(self, library, folder):
+        if library is None or library.folder != folder:
+            return SpectrumLibrary(folder, sigma=self.pipeline.sigma)
+        library.refresh()
+        return library
 
     def select_ref_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "选择参考光谱文件夹")
@@ -412,24 +549,26 @@ class App(QMainWindow):
             self.build_ref_block()
 
     def save_ref(self):
-        ininame = make_ref_file()
+        ininame = make_ref_file(".npz")
         full_path = os.path.join(self.ref_folder, ininame)
-        ref_path, _ = QFileDialog.getSaveFileName(self, "Save As", full_path, 'CSV(*.csv)')
+        ref_path, _ = QFileDialog.getSaveFileName(self, "Save As", full_path, SPECTRUM_FILTER)
         if ref_path:
-            save_file(self.x, self.y, ref_path)
-            self.build_ref_block()
+            save_file(self.x, self.y, ref_path, self.spectrum_metadata("ref"))
+            self.ref_watcher.refresh()
 
     def update_ref_files(self):
         if self.ref_folder:
-            self.radio_buttons_group = QButtonGroup(self.scrollable_frame_2)
-            filenames = os.listdir(self.ref_folder)
-            for filename in filenames:
-                radio_button = QRadioButton(filename)
-                radio_button.toggled.connect(
-                    lambda checked, file=filename: self.load_ref(checked, file)
-                )
-                self.scrollable_layout_2.addWidget(radio_button)
-                self.radio_buttons_group.addButton(radio_button)
+            self.ref_library = self.open_library(self.ref_library, self.ref_folder)
+            self.ref_group = QButtonGroup(self.scrollable_frame_2)
+            self.ref_buttons = {}
+            self.update_file_buttons(
+                self.ref_buttons,
+                self.scrollable_layout_2,
+                self.ref_group,
+                self.ref_library.names(),
+                self.load_ref,
+            )
+            self.ref_watcher.watch(self.ref_library)
         # else:
         #     label = QLabel("请选择暗光谱文件夹。")
 
@@ -438,8 +577,8 @@ class App(QMainWindow):
         self.sample_time = int(self.sample_entry.text())
         self.diff = int(self.diff_entry.text())
         self.position = int(self.position_entry.text())
-        closest_x = self.find_interval(self.x, self.position)
-        self.idx_y = list(self.x).index(closest_x)
+        self.pipeline.diff = self.diff
+        self.pipeline.set_position(self.position)
 
         self.calculate_ref_area()
 
@@ -450,48 +589,42 @@ class App(QMainWindow):
 
     def calculate_ref_area(self):
         self.range_low = int(self.range1.text())
-        closest_range1 = self.find_interval(self.x, self.range_low)
-        self.range1_idx = list(self.x).index(closest_range1)
-
         self.range_high = int(self.range2.text())
-        closest_range2 = self.find_interval(self.x, self.range_high)
-        self.range2_idx = list(self.x).index(closest_range2)
-
-        self.area_ref = np.dot(
-            self.x_ref[self.range1_idx : self.range2_idx],
-            self.y_refs[self.range1_idx : self.range2_idx],
-        )
+        self.pipeline.set_area_range(self.range_low, self.range_high)
 
     def update_plots(self):
         try:
-            self.make_absorb()
-            self.min_idx = self.find_minimum(self.y_abs)
+            metrics = self.pipeline.analyze()
+            self.x_ab, self.y_abs = self.pipeline.x_ab, self.pipeline.y_abs
+            self.min_idx = metrics.min_idx
 
             if self.fix_minimum == False:
                 self.min_idx_display = self.min_idx
                 self.update_min_value()
 
-            self.centroid_x, self.centroid_y = self.find_centroid(
-                x=self.x_ab,
-                y=self.y_abs,
-                min_idx=self.min_idx_display,
-                diff=self.diff,
+            self.centroid_x = metrics.centroid_x
+            self.centroid_y = metrics.centroid_y
+            self.series.append(
+                self.last_ts,
+                centroid=self.centroid_x,
+                intensity=metrics.intensity,
+                min=metrics.min_wavelength,
+                area_ratio=metrics.area_ratio,
             )
-            self.centroids.append(self.centroid_x)
-            self.centroids_sm = gaussian_filter1d(self.centroids, sigma=10)
-
-            self.intensities.append(self.y_abs[self.idx_y])
-            self.intensities_sm = gaussian_filter1d(self.intensities, sigma=10)
-
-            self.mins.append(self.x_ab[self.min_idx])
-
-            area_current = np.dot(
-                self.x[self.range1_idx : self.range2_idx],
-                self.y_s[self.range1_idx : self.range2_idx],
-            )
-            self.area_ratios.append(area_current / self.area_ref * 100)
-
-            self.times = list(range(len(self.centroids)))
+            self.centroid_smoother.update()
+            self.centroids_sm = self.centroid_smoother.values
+            self.intensity_smoother.update()
+            self.intensities_sm = self.intensity_smoother.values
+            if self.recorder is not None:
+                self.recorder.record_metrics(metrics, self.last_ts, self.last_seq)
+
+            for lod in (
+                self.centroids_lod,
+                self.intensities_lod,
+                self.mins_lod,
+                self.area_ratios_lod,
+            ):
+                lod.update()
 
             self.update_center_value()
 
@@ -502,19 +635,7 @@ class App(QMainWindow):
                 self.auto_rescale6()
                 self.inited_plots = True
 
-            current_idx = int(self.notebook.currentIndex()) + 1
-
-            if current_idx == 3:
-                self.update_plot3()
-
-            if current_idx == 4:
-                self.update_plot4()
-
-            if current_idx == 5:
-                self.update_plot5()
-
-            if current_idx == 6:
-                self.update_plot6()
+            self.display.mark("plot3", "plot4", "plot5", "plot6")
 
         except ValueError:
             pass
@@ -527,6 +648,7 @@ class App(QMainWindow):
         else:
             self.toggle_button.setText("最低点")
         self.fix_minimum = not self.fix_minimum
+        self.pipeline.fix_minimum = self.fix_minimum
 
     def stop_absorb(self):
         self.stop_ts_button.setEnabled(False)
@@ -535,12 +657,14 @@ class App(QMainWindow):
     def load_dark(self, checked, file):
         if checked:
             self.dark_file = os.path.join(self.dark_folder, file)
-            self.x_dark, self.y_dark = load_file(self.dark_file)
-            self.y_darks = gaussian_filter1d(self.y_dark, sigma=100)
+            spectrum = self.dark_library.load(file)
+            self.x_dark, self.y_dark = spectrum.x, spectrum.y
+            if self.recorder is not None:
+                self.recorder.set_reference("dark", self.dark_file)
+            self.y_darks = self.pipeline.set_dark(self.y_dark, spectrum.y_smooth)
             self.plot1_dark.set_data(self.x_dark, self.y_darks)
-            self.ax1.relim()
-            self.ax1.autoscale_view()
-            self.canvas1.draw()
+            self.panel1.autoscale()
+            self.panel1.draw()
 
             if len(self.y_s) > 0:
                 self.init_ratio()
@@ -549,12 +673,16 @@ class App(QMainWindow):
     def load_ref(self, checked, file):
         if checked:
             self.ref_file = os.path.join(self.ref_folder, file)
-            self.x_ref, self.y_ref = load_file(self.ref_file)
-            self.y_refs = gaussian_filter1d(self.y_ref, sigma=100)
+            spectrum = self.ref_library.load(file)
+            self.x_ref, self.y_ref = spectrum.x, spectrum.y
+            if self.recorder is not None:
+                self.recorder.set_reference("ref", self.ref_file)
+            self.y_refs = self.pipeline.set_ref(
+                self.x_ref, self.y_ref, spectrum.y_smooth
+            )
             self.plot1_ref.set_data(self.x_ref, self.y_refs)
-            self.ax1.relim()
-            self.ax1.autoscale_view()
-            self.canvas1.draw()
+            self.panel1.autoscale()
+            self.panel1.draw()
 
             if len(self.y_s) > 0:
                 self.init_ratio()
@@ -569,273 +697,177 @@ class App(QMainWindow):
 
     def stop_real(self):
         self.stop_button.setEnabled(False)
-        self.signal_generator.close_spectrometers()
+        self.acquisition.stop()
+        self.stop_recording()
         self.inited_absorb = False
         self.int_timer.stop()
 
+    def check_acquisition(self):
+        """Stop cleanly when the acquisition thread has ended on its own."""
+        acquisition = self.acquisition
+        if acquisition.is_alive():
+            return
+        if self.stop_ts_button.isEnabled():
+            self.stop_absorb()
+        self.stop_real()
+        if acquisition.error is not None:
+            self.show_acquisition_error(acquisition.error)
+        else:
+            self.statusBar().showMessage("采集已结束", 5000)
+
+    def show_acquisition_error(self, error):
+        QMessageBox.warning(self, "采集中断", f"光谱仪读取失败:\n{error}")
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.acquisition.recorder = None
+            self.recorder.close()
+            self.recorder = None
+
+    def check_recorder(self):
+        # the writer thread never blocks acquisition, so failures surface here
+        recorder = self.recorder
+        if recorder is None:
+            return
+        if recorder.error is not None:
+            self.stop_recording()
+            self.statusBar().showMessage(f"记录已停止: {recorder.error}")
+        elif recorder.dropped != self.recorder_dropped:
+            self.recorder_dropped = recorder.dropped
+            self.statusBar().showMessage(f"记录队列已满, 已丢弃 {recorder.dropped} 条")
+
     def clean_plots(self):
-        self.times, self.centroids, self.intensities, self.mins, self.area_ratios = (
-            [],
-            [],
-            [],
-            [],
-            [],
-        )
+        self.series.clear()
+        self.centroid_smoother.clear()
+        self.intensity_smoother.clear()
+        for lod in (
+            self.centroids_lod,
+            self.intensities_lod,
+            self.mins_lod,
+            self.area_ratios_lod,
+        ):
+            lod.clear()
         self.plot3_time.set_data([], [])
-        self.canvas3.draw()
+        self.panel3.draw()
         self.plot4_intensity.set_data([], [])
-        self.canvas4.draw()
+        self.panel4.draw()
         self.plot5_lowest.set_data([], [])
-        self.canvas5.draw()
+        self.panel5.draw()
         self.plot6_area.set_data([], [])
-        self.canvas6.draw()
+        self.panel6.draw()
         self.sample_timer.stop()
 
-    def build_tab1(self):
-        tab1 = QWidget()
-        self.notebook.addTab(tab1, "光谱")
-        tab1_layout = QGridLayout(tab1)
+    def build_plot_tab(self, title, xlabel, ylabel, auto_rescale):
+        tab = QWidget()
+        self.notebook.addTab(tab, title)
+        tab_layout = QGridLayout(tab)
 
-        plot_frame = QFrame(tab1)
+        plot_frame = QFrame(tab)
         plot_frame_layout = QVBoxLayout(plot_frame)
         plot_frame.setLayout(plot_frame_layout)
-        tab1_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig1, self.ax1 = plt.subplots()
-        self.ax1.set_xlabel("Wavelength")
-        self.ax1.set_ylabel("Intensity")
-        (self.plot1_real,) = self.ax1.plot([], [], "-", label="Real time")
-        (self.plot1_ref,) = self.ax1.plot([], [], "-", label="Reference")
-        (self.plot1_dark,) = self.ax1.plot([], [], "-", label="Dark")
-        self.ax1.legend()
+        tab_layout.addWidget(plot_frame, 0, 0, 3, 3)
 
-        self.canvas1 = FigureCanvas(fig1)
-        plot_frame_layout.addWidget(self.canvas1)
-        self.canvas1.mpl_connect("scroll_event", self.on_scroll)
+        panel = make_panel(xlabel, ylabel)
+        plot_frame_layout.addWidget(panel.widget)
 
         auto_button = QPushButton("自适应")
         auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale1)
-        tab1_layout.addWidget(auto_button, 3, 0)
+        auto_button.clicked.connect(auto_rescale)
+        tab_layout.addWidget(auto_button, 3, 0)
 
-        toolbar = NavigationToolbar(self.canvas1, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab1_layout.addWidget(toolbar, 3, 1, 1, 1)
+        toolbar = panel.make_toolbar(plot_frame)
+        if toolbar is not None:
+            toolbar.setFixedHeight(50)
+            tab_layout.addWidget(toolbar, 3, 1, 1, 1)
+        return panel
 
-    def build_tab2(self):
-        tab2 = QWidget()
-        self.notebook.addTab(tab2, "透射")
-        tab2_layout = QGridLayout(tab2)
-
-        plot_frame = QFrame(tab2)
-        plot_frame_layout = QVBoxLayout(plot_frame)
-        plot_frame.setLayout(plot_frame_layout)
-        tab2_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig2, self.ax2 = plt.subplots()
-        self.ax2.set_xlabel("Wavelength")
-        self.ax2.set_ylabel("Ratio")
-        (self.plot2_absorb,) = self.ax2.plot([], [], "-", label="Real time")
-        (self.plot2_center,) = self.ax2.plot([], [], ".", label="Centroid")
-
-        self.canvas2 = FigureCanvas(fig2)
-        plot_frame_layout.addWidget(self.canvas2)
-        self.canvas2.mpl_connect("scroll_event", self.on_scroll)
-
-        auto_button = QPushButton("自适应")
-        auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale2)
-        tab2_layout.addWidget(auto_button, 3, 0)
+    def build_tab1(self):
+        self.panel1 = self.build_plot_tab(
+            "光谱", "Wavelength", "Intensity", self.auto_rescale1
+        )
+        self.plot1_real = self.panel1.add_line("-", label="Real time")
+        self.plot1_ref = self.panel1.add_line("-", label="Reference")
+        self.plot1_dark = self.panel1.add_line("-", label="Dark")
+        self.panel1.add_legend()
 
-        toolbar = NavigationToolbar(self.canvas2, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab2_layout.addWidget(toolbar, 3, 1, 1, 1)
+    def build_tab2(self):
+        self.panel2 = self.build_plot_tab(
+            "透射", "Wavelength", "Ratio", self.auto_rescale2
+        )
+        self.plot2_absorb = self.panel2.add_line("-", label="Real time")
+        self.plot2_center = self.panel2.add_line(".", label="Centroid")
 
     def build_tab3(self):
-        tab3 = QWidget()
-        self.notebook.addTab(tab3, "时序")
-        tab3_layout = QGridLayout(tab3)
-
-        plot_frame = QFrame(tab3)
-        plot_frame_layout = QVBoxLayout(plot_frame)
-        plot_frame.setLayout(plot_frame_layout)
-        tab3_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig3, self.ax3 = plt.subplots()
-        self.ax3.set_xlabel("Time")
-        self.ax3.set_ylabel("Wavelength")
-        (self.plot3_time,) = self.ax3.plot([], [], "-")
-
-        self.canvas3 = FigureCanvas(fig3)
-        plot_frame_layout.addWidget(self.canvas3)
-        self.canvas3.mpl_connect("scroll_event", self.on_scroll)
-
-        auto_button = QPushButton("自适应")
-        auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale3)
-        tab3_layout.addWidget(auto_button, 3, 0)
-
-        toolbar = NavigationToolbar(self.canvas3, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab3_layout.addWidget(toolbar, 3, 1, 1, 1)
+        self.panel3 = self.build_plot_tab(
+            "时序", "Time", "Wavelength", self.auto_rescale3
+        )
+        self.plot3_time = self.panel3.add_line("-")
 
     def build_tab4(self):
-        tab4 = QWidget()
-        self.notebook.addTab(tab4, "强度时序")
-        tab4_layout = QGridLayout(tab4)
-
-        plot_frame = QFrame(tab4)
-        plot_frame_layout = QVBoxLayout(plot_frame)
-        plot_frame.setLayout(plot_frame_layout)
-        tab4_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig4, self.ax4 = plt.subplots()
-        self.ax4.set_xlabel("Time")
-        self.ax4.set_ylabel("Wavelength")
-        (self.plot4_intensity,) = self.ax4.plot([], [], "-")
-
-        self.canvas4 = FigureCanvas(fig4)
-        plot_frame_layout.addWidget(self.canvas4)
-        self.canvas4.mpl_connect("scroll_event", self.on_scroll)
-
-        auto_button = QPushButton("自适应")
-        auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale4)
-        tab4_layout.addWidget(auto_button, 3, 0)
-
-        toolbar = NavigationToolbar(self.canvas4, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab4_layout.addWidget(toolbar, 3, 1, 1, 1)
+        self.panel4 = self.build_plot_tab(
+            "强度时序", "Time", "Wavelength", self.auto_rescale4
+        )
+        self.plot4_intensity = self.panel4.add_line("-")
 
     def build_tab5(self):
-        tab5 = QWidget()
-        self.notebook.addTab(tab5, "最低点")
-        tab5_layout = QGridLayout(tab5)
-
-        plot_frame = QFrame(tab5)
-        plot_frame_layout = QVBoxLayout(plot_frame)
-        plot_frame.setLayout(plot_frame_layout)
-        tab5_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig5, self.ax5 = plt.subplots()
-        self.ax5.set_xlabel("Time")
-        self.ax5.set_ylabel("Wavelength")
-        (self.plot5_lowest,) = self.ax5.plot([], [], "-")
-
-        self.canvas5 = FigureCanvas(fig5)
-        plot_frame_layout.addWidget(self.canvas5)
-        self.canvas5.mpl_connect("scroll_event", self.on_scroll)
-
-        auto_button = QPushButton("自适应")
-        auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale5)
-        tab5_layout.addWidget(auto_button, 3, 0)
-
-        toolbar = NavigationToolbar(self.canvas5, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab5_layout.addWidget(toolbar, 3, 1, 1, 1)
+        self.panel5 = self.build_plot_tab(
+            "最低点", "Time", "Wavelength", self.auto_rescale5
+        )
+        self.plot5_lowest = self.panel5.add_line("-")
 
     def build_tab6(self):
-        tab6 = QWidget()
-        self.notebook.addTab(tab6, "波长x强度")
-        tab6_layout = QGridLayout(tab6)
-
-        plot_frame = QFrame(tab6)
-        plot_frame_layout = QVBoxLayout(plot_frame)
-        plot_frame.setLayout(plot_frame_layout)
-        tab6_layout.addWidget(plot_frame, 0, 0, 3, 3)
-
-        fig6, self.ax6 = plt.subplots()
-        self.ax6.set_xlabel("Time")
-        self.ax6.set_ylabel("Wavelength")
-        (self.plot6_area,) = self.ax6.plot([], [], "-")
-
-        self.canvas6 = FigureCanvas(fig6)
-        plot_frame_layout.addWidget(self.canvas6)
-        self.canvas6.mpl_connect("scroll_event", self.on_scroll)
-
-        auto_button = QPushButton("自适应")
-        auto_button.setFixedWidth(100)
-        auto_button.clicked.connect(self.auto_rescale6)
-        tab6_layout.addWidget(auto_button, 3, 0)
-
-        toolbar = NavigationToolbar(self.canvas6, plot_frame)
-        toolbar.setFixedHeight(50)
-        tab6_layout.addWidget(toolbar, 3, 1, 1, 1)
+        self.panel6 = self.build_plot_tab(
+            "波长x强度", "Time", "Wavelength", self.auto_rescale6
+        )
+        self.plot6_area = self.panel6.add_line("-")
 
     def auto_rescale1(self):
-        self.ax1.set_xlim(min(self.x) - 50, max(self.x) + 50)
+        self.panel1.set_xlim(min(self.x) - 50, max(self.x) + 50)
         y = list(self.y_s) + list(self.y_darks) + list(self.y_refs)
         delta = max(y) - min(y)
-        self.ax1.set_ylim(
+        self.panel1.set_ylim(
             min(y) - 0.1 * delta,
             max(y) + 0.1 * delta,
         )
-        self.canvas1.draw()
+        self.panel1.draw()
 
     def auto_rescale2(self):
-        self.ax1.set_xlim(min(self.x) - 50, max(self.x) + 50)
+        self.panel1.set_xlim(min(self.x) - 50, max(self.x) + 50)
         delta = max(self.y_abs) - min(self.y_abs)
-        self.ax2.set_ylim(
+        self.panel2.set_ylim(
             min(self.y_abs) - 0.1 * delta,
             max(self.y_abs) + 0.1 * delta,
         )
-        self.canvas2.draw()
+        self.panel2.draw()
 
     def auto_rescale3(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
-        self.ax3.set_xlim(0, xmax)
-        delta = max(self.centroids) - min(self.centroids)
-        self.ax3.set_ylim(
-            min(self.centroids) - 0.1 * delta,
-            max(self.centroids) + 0.1 * delta,
-        )
-        self.canvas3.draw()
+        self.rescale_time_plot(self.panel3, self.series["centroid"])
 
     def auto_rescale4(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
-        self.ax4.set_xlim(0, xmax)
-        delta = max(self.intensities) - min(self.intensities)
-        self.ax4.set_ylim(
-            min(self.intensities) - 0.1 * delta,
-            max(self.intensities) + 0.1 * delta,
-        )
-        self.canvas4.draw()
+        self.rescale_time_plot(self.panel4, self.series["intensity"])
 
     def auto_rescale5(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
-        self.ax5.set_xlim(0, xmax)
-        delta = max(self.mins) - min(self.mins)
-        self.ax5.set_ylim(
-            min(self.mins) - 0.1 * delta,
-            max(self.mins) + 0.1 * delta,
-        )
-        self.canvas5.draw()
+        self.rescale_time_plot(self.panel5, self.series["min"])
 
     def auto_rescale6(self):
-        xmax = (int(self.times[-1] / self.scale_factor_x) + 1) * self.scale_factor_x
-        self.ax6.set_xlim(0, xmax)
-        delta = max(self.area_ratios) - min(self.area_ratios)
-        self.ax6.set_ylim(
-            min(self.area_ratios) - 0.1 * delta,
-            max(self.area_ratios) + 0.1 * delta,
-        )
-        self.canvas6.draw()
+        self.rescale_time_plot(self.panel6, self.series["area_ratio"])
+
+    def rescale_time_plot(self, panel, values):
+        xmax = ((len(values) - 1) // self.scale_factor_x + 1) * self.scale_factor_x
+        panel.set_xlim(0, xmax)
+        low, high = values.min(), values.max()
+        delta = high - low
+        panel.set_ylim(low - 0.1 * delta, high + 0.1 * delta)
+        panel.draw()
 
     def make_absorb(self):
-        self.x_ab = self.x[:3000]
-        self.y_abs = (
-            abs(
-                (self.y_s[:3000] - self.y_darks[:3000])
-                / (self.y_refs[:3000] - self.y_darks[:3000])
-            )
-            * 100
-        )
+        self.x_ab = self.pipeline.x_ab
+        self.y_abs = self.pipeline.make_absorb()
 
     def update_ratio(self):
         if (len(self.y_refs) > 0) and (len(self.y_darks) > 0):
             self.make_absorb()
-            self.update_plot2()
+            self.display.mark("plot2")
         else:
             pass
 
@@ -849,204 +881,124 @@ class App(QMainWindow):
         self.plot2_absorb.set_data(self.x_ab, self.y_abs)
         if self.centroid_x:
             self.plot2_center.set_data([self.centroid_x], [self.centroid_y])
-        self.ax2.relim()
-        self.ax2.autoscale_view()
-        self.canvas2.draw()
+        self.panel2.autoscale()
+        self.panel2.draw()
 
     def init_plot3(self):
-        self.plot3_time.set_data(self.times, self.centroids)
-        self.ax3.relim()
-        self.ax3.autoscale_view()
-        self.canvas3.draw()
+        self.plot3_time.set_data(self.series.index, self.series["centroid"])
+        self.panel3.autoscale()
+        self.panel3.draw()
 
     def init_plot4(self):
-        self.plot4_intensity.set_data(self.times, self.intensities)
-        self.ax4.relim()
-        self.ax4.autoscale_view()
-        self.canvas4.draw()
+        self.plot4_intensity.set_data(self.series.index, self.series["intensity"])
+        self.panel4.autoscale()
+        self.panel4.draw()
 
     def init_plot5(self):
-        self.plot5_lowest.set_data(self.times, self.mins)
-        self.ax5.relim()
-        self.ax5.autoscale_view()
-        self.canvas5.draw()
+        self.plot5_lowest.set_data(self.series.index, self.series["min"])
+        self.panel5.autoscale()
+        self.panel5.draw()
 
     def init_plot6(self):
-        self.plot6_area.set_data(self.times, self.area_ratios)
-        self.ax6.relim()
-        self.ax6.autoscale_view()
-        self.canvas6.draw()
+        self.plot6_area.set_data(self.series.index, self.series["area_ratio"])
+        self.panel6.autoscale()
+        self.panel6.draw()
 
     def update_plot2(self):
         self.plot2_absorb.set_data(self.x_ab, self.y_abs)
-        self.canvas2.draw()
+        self.panel2.update()
 
     def update_plot3(self):
-        xmin, xmax = self.ax3.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
-            if new_xmax > xmax:
-                self.ax3.set_xlim(xmin, new_xmax)
+        self.extend_time_axis(self.panel3)
 
-        self.plot3_time.set_data(self.times, self.centroids)
-        self.canvas3.draw()
+        self.plot3_time.set_data(*self.decimate(self.centroids_lod, self.panel3))
+        self.panel3.update()
 
     def update_plot4(self):
-        xmin, xmax = self.ax4.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
-            if new_xmax > xmax:
-                self.ax4.set_xlim(xmin, new_xmax)
+        self.extend_time_axis(self.panel4)
 
-        self.plot4_intensity.set_data(self.times, self.intensities)
-        self.canvas4.draw()
+        self.plot4_intensity.set_data(*self.decimate(self.intensities_lod, self.panel4))
+        self.panel4.update()
 
     def update_plot5(self):
-        xmin, xmax = self.ax5.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
-            if new_xmax > xmax:
-                self.ax5.set_xlim(xmin, new_xmax)
+        self.extend_time_axis(self.panel5)
 
-        self.plot5_lowest.set_data(self.times, self.mins)
-        self.canvas5.draw()
+        self.plot5_lowest.set_data(*self.decimate(self.mins_lod, self.panel5))
+        self.panel5.update()
 
     def update_plot6(self):
-        xmin, xmax = self.ax6.get_xlim()
-        if self.times[-1] % self.scale_factor_x == 0:
-            new_xmax = self.times[-1] + self.scale_factor_x
-            if new_xmax > xmax:
-                self.ax6.set_xlim(xmin, new_xmax)
-
-        self.plot6_area.set_data(self.times, self.area_ratios)
-        self.canvas6.draw()
-
-    @staticmethod
-    def find_minimum(y):
-        min_index = np.argmin(y)
-        return min_index
-
-    @staticmethod
-    def find_interval(arr, value):
-        if value < arr[0] or value >= arr[-1]:
-            return None
-
-        low, high = 0, len(arr) - 1
-        while low <= high:
-            mid = (low + high) // 2
-            if arr[mid] <= value < arr[mid + 1]:
-                return arr[mid]
-            elif value < arr[mid]:
-                high = mid - 1
-            else:
-                low = mid + 1
-
-        return None
-
-    def find_centroid(self, x, y, min_idx, diff):
-        x_min = x[min_idx]
-        xl = self.find_interval(x[:min_idx], x_min - diff)
-        xr = self.find_interval(x[min_idx:], x_min + diff)
-        il, ir = list(x).index(xl), list(x).index(xr)
-        boundary = list(
-            zip(list(x[il:ir]) + [x[ir], x[il]], list(y[il:ir]) + [100, 100])
-        )
-        polygon = Polygon(boundary)
-        return polygon.centroid.x, polygon.centroid.y
+        self.extend_time_axis(self.panel6)
+
+        self.plot6_area.set_data(*self.decimate(self.area_ratios_lod, self.panel6))
+        self.panel6.update()
+
+    def extend_time_axis(self, panel):
+        # several samples can arrive between repaints, so round up to the next
+        # multiple of scale_factor_x instead of waiting to land exactly on one
+        if not len(self.series):
+            return
+        xmin, xmax = panel.get_xlim()
+        step = self.scale_factor_x
+        new_xmax = ((len(self.series) - 1) // step + 1) * step
+        if new_xmax > xmax:
+            panel.set_xlim(xmin, new_xmax)
+
+    def decimate(self, lod, panel):
+        # times are sample indices, so the visible x range maps to indices
+        xmin, xmax = panel.get_xlim()
+        return lod.query(np.floor(xmin), np.ceil(xmax) + 1, panel.widget.width())
 
     def save_data(self):
         ininame = make_results_file()
         result_path, _ = QFileDialog.getSaveFileName(self, "Save As", ininame, 'Excel (*.xlsx *.xls)')
-        self.save_to_excel(result_path)
+        if result_path:
+            self.save_to_excel(result_path)
 
     def save_to_excel(self, file_path):
-        df1 = pd.DataFrame(
-            {
-                "Wave Length": self.x_dark,
-                "Dark Intensity": self.y_dark,
-                "Dark Intensity(smooth)": self.y_darks,
-                "Reference Intensity": self.y_ref,
-                "Reference Intensity(smooth)": self.y_refs,
-            }
-        )
-
-        df2 = pd.DataFrame({"Wave Length": self.x_ab, "Ratio": self.y_abs})
-
-        df3 = pd.DataFrame(
-            {"time": np.array(range(len(self.centroids)))*self.sample_time/1000, "Centroid": self.centroids, "Centroid(smooth)": self.centroids_sm}
-        )
-
-        df4 = pd.DataFrame(
-            {"time": np.array(range(len(self.intensities)))*self.sample_time/1000, "Intensity": self.intensities, "Intensity(smooth)": self.intensities_sm}
+        # snapshot now, write in the background so sampling keeps running
+        export = build_export(
+            file_path,
+            self.series,
+            self.centroids_sm,
+            self.intensities_sm,
+            dark=(self.x_dark, self.y_dark, self.y_darks),
+            ref=(self.y_ref, self.y_refs),
+            absorbance=(self.x_ab, self.y_abs),
+            params=ExportParameters(
+                int_time=self.int_time,
+                sample_time=self.sample_time,
+                dark_file=self.dark_file,
+                ref_file=self.ref_file,
+                diff=self.diff,
+                position=self.position,
+                range_low=self.range_low,
+                range_high=self.range_high,
+                min_wavelength=self.x_ab[self.min_idx_display],
+            ),
         )
+        if export.table is None and len(self.series) >= EXCEL_MAX_ROWS:
+            QMessageBox.warning(
+                self,
+                "数据过长",
+                f"Excel 只保存前 {EXCEL_MAX_ROWS - 1} 行, 完整数据需要安装 pyarrow",
+            )
 
-        df5 = pd.DataFrame({"time": np.array(range(len(self.mins)))*self.sample_time/1000, "Minimal": self.mins})
-
-        df6 = pd.DataFrame({"time": np.array(range(len(self.area_ratios)))*self.sample_time/1000, "Ratio of area": self.area_ratios})
-
-        df7 = pd.DataFrame(
-            {
-                "积分时间(ms)": self.int_time,
-                "采样时间(ms)": self.sample_time,
-                "暗光谱": self.dark_file,
-                "参考光谱": self.ref_file,
-                "质心范围(+/-)": self.diff,
-                "强度位置": self.position,
-                "面积范围": f"{self.range_low}-{self.range_high}",
-                "固定最低点": self.x_ab[self.min_idx_display],
-                "数据文件路径": file_path,
-            }.items()
+        self.export_job = ExportJob(
+            export.sheets,
+            file_path,
+            table=export.table,
+            parquet_path=export.parquet_path,
+            metadata=export.parameters,
+            on_done=self.export_done.emit,
         )
+        self.export_job.start()
 
-        with pd.ExcelWriter(path=file_path) as writer:
-            df1.to_excel(writer, sheet_name="光谱", index=False)
-            df2.to_excel(writer, sheet_name="吸收", index=False)
-            df3.to_excel(writer, sheet_name="时序", index=False)
-            df4.to_excel(writer, sheet_name="强度", index=False)
-            df5.to_excel(writer, sheet_name="最低点", index=False)
-            df6.to_excel(writer, sheet_name="面积比", index=False)
-            df7.to_excel(writer, sheet_name="参数", index=False)
-
-    def on_scroll(self, event):
-        ax = event.inaxes
-        if ax is None:
-            return
-
-        xdata, ydata = event.xdata, event.ydata  # Mouse position in data coords
-        if xdata is None or ydata is None:
-            return  # Ignore scroll events outside the axes
-
-        base_scale = 1.1  # Determines the zoom speed
-        if event.button == "up":
-            # Zoom in
-            scale_factor = 1 / base_scale
-        elif event.button == "down":
-            # Zoom out
-            scale_factor = base_scale
+    def on_export_done(self, file_path, errors):
+        if errors:
+            message = "\n".join(f"{path}\n{error}" for path, error in errors.items())
+            QMessageBox.warning(self, "保存失败", message)
         else:
-            # Unhandled button
-            return
-
-        xlim = ax.get_xlim()
-        ylim = ax.get_ylim()
-
-        # Determine the mouse position relative to the plot bounds
-        if (ydata - ylim[0]) / (ylim[1] - ylim[0]) < 0.1:
-            ax.set_xlim(
-                [
-                    xdata - (xdata - xlim[0]) * scale_factor,
-                    xdata + (xlim[1] - xdata) * scale_factor,
-                ]
-            )
-
-        elif (xdata - xlim[0]) / (xlim[1] - xlim[0]) < 0.1:
-            ax.set_ylim(
-                [
-                    ydata - (ydata - ylim[0]) * scale_factor,
-                    ydata + (ylim[1] - ydata) * scale_factor,
-                ]
-            )
-
+            self.statusBar().showMessage(f"已保存 {file_path}", 5000)
 
 if __name__ == "__main__":
     qdarktheme.enable_hi_dpi()